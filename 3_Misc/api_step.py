@@ -0,0 +1,13 @@
+from getgauge.python import step
+from autocore.utils.latency_util import assert_latency
+
+
+class ApiLatency:
+
+    @step("[APIRequest] Assert p<percent> latency of <method> <path> is under <max_ms> ms over this spec")
+    def assert_spec_latency(self, percent, method, path, max_ms):
+        assert_latency(method, path, float(percent), float(max_ms), "spec")
+
+    @step("[APIRequest] Assert p<percent> latency of <method> <path> is under <max_ms> ms over this suite")
+    def assert_suite_latency(self, percent, method, path, max_ms):
+        assert_latency(method, path, float(percent), float(max_ms), "suite")
@@ -1,5 +1,4 @@
 import base64
-import json
 import os
 import platform
 import time
@@ -25,10 +24,14 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.select import Select
 from selenium.webdriver.support.wait import WebDriverWait
 
-from .utils import color_names, gauge_wrap, logger, timing
+from .utils import gauge_wrap, logger, timing
 from .utils.API_request import APIRequest
-from .utils.image_util import get_box
+from .utils.color_util import get_color_histogram, get_color_name_histogram, get_dominant_colors
+from .utils.event_util import get_event_buffers, is_subscribed, match_url
+from .utils.image_util import find_images, match_template
+from .utils.network_util import get_performance_log, is_network_capture_on, start_network_capture, stop_network_capture
 from .utils.string_util import StringUtil
+from .utils.wait_util import ELEMENT_STATE_SCRIPT, READY_STATES, Poller, wait_for_dom_change, wait_for_ready_state
 
 
 class BasePage(object):
@@ -358,36 +361,28 @@ class BasePage(object):
             if not os.path.exists(baseline_image):
                 logger.warning(f"«{baseline_image}» is not existed !!!")
                 return False
-            # img = Image.open(image_file_path)
-            # list_scale = [*sum(zip(range(100, 102), reversed(range(99, 100))), ())]
             start = time.time()
-            box = None
-            list_scale = [100, 50, 200]
-            confidence = 100
-            with Image.open(baseline_image) as img:
-                with Image.open(BytesIO(base64.b64decode(self._driver.get_screenshot_as_base64()))) as full_img:
-                    min_confidence = 85
-                    while box is None and confidence != min_confidence and (time.time() - start) < self.__DEFAULT_TIMEOUT:
-                        for confidence in reversed(range(min_confidence, 100)):
-                            for scale in list_scale:
-                                box = get_box(img, full_img, scale, confidence)
-                                if box is not None:
-                                    win_rect = self._driver.get_window_rect()
-                                    x_image = ((box.left + box.width / 2) / full_img.size[0]) * win_rect["width"]
-                                    y_image = ((box.top + box.height / 2) / (win_rect["height"] * full_img.size[0] / win_rect["width"])) * win_rect["height"]
-                                    self._actions.w3c_actions.pointer_action.move_to_location(x_image, y_image)
-                                    if button.lower() == "left":
-                                        self._actions.click().perform()
-                                    else:
-                                        self._actions.context_click().perform()
-                                    if show_log:
-                                        message = f"«{baseline_image}» is found in {time.time()-start:.3f} seconds !!!"
-                                        logger.debug(message)
-                                        if data_store.suite.license:
-                                            Messages.write_message(message)
-                                    return True
+            with Image.open(BytesIO(base64.b64decode(self._driver.get_screenshot_as_base64()))) as full_img:
+                match = match_template(baseline_image, full_img, [100, 50, 200], confidence=85)
+                full_img_width = full_img.size[0]
+            if match.box is not None:
+                box = match.box
+                win_rect = self._driver.get_window_rect()
+                x_image = ((box.left + box.width / 2) / full_img_width) * win_rect["width"]
+                y_image = ((box.top + box.height / 2) / (win_rect["height"] * full_img_width / win_rect["width"])) * win_rect["height"]
+                self._actions.w3c_actions.pointer_action.move_to_location(x_image, y_image)
+                if button.lower() == "left":
+                    self._actions.click().perform()
+                else:
+                    self._actions.context_click().perform()
+                if show_log:
+                    message = f"«{baseline_image}» is found (score {match.score:.3f}, scale {match.scale}%) in {time.time()-start:.3f} seconds !!!"
+                    logger.debug(message)
+                    if data_store.suite.license:
+                        Messages.write_message(message)
+                return True
             if show_log:
-                message = f"«{baseline_image}» is not detected in {time.time()-start:.3f} seconds !!!"
+                message = f"«{baseline_image}» is not detected (best score {match.score:.3f}) in {time.time()-start:.3f} seconds !!!"
                 logger.warning(message)
                 if data_store.suite.license:
                     Messages.write_message(message)
@@ -396,6 +391,26 @@ class BasePage(object):
             logger.error(exception)
             return False
 
+    @gauge_wrap
+    def find_images(self, baseline_images: list, confidence: int = 85):
+        """
+        Find several baseline images in one screenshot, e.g. to detect which of several dialogs is showing
+        Args:
+            baseline_images (list): [Paths of baseline images]
+            confidence (int, optional): [Minimum score (0-100) of a match]. Defaults to 85.
+        Returns:
+            dict: {baseline image: ImageMatch (box is None if the image is not found)}
+        """
+        try:
+            for baseline_image in [baseline_image for baseline_image in baseline_images if not os.path.exists(baseline_image)]:
+                logger.warning(f"«{baseline_image}» is not existed !!!")
+            baseline_images = [baseline_image for baseline_image in baseline_images if os.path.exists(baseline_image)]
+            with Image.open(BytesIO(base64.b64decode(self._driver.get_screenshot_as_base64()))) as full_img:
+                return find_images(baseline_images, full_img, [100, 50, 200], confidence)
+        except Exception as exception:
+            logger.error(exception)
+            return None
+
     @gauge_wrap
     def click_by_action_chains(self, element_locator, timeout_in_seconds: int = None):
         timeout = max(timeout_in_seconds, 0) if timeout_in_seconds is not None else self.__DEFAULT_TIMEOUT
@@ -481,6 +496,13 @@ class BasePage(object):
         except Exception as exception:
             logger.error(exception)
 
+    def __get_element_state(self, element_locator, attribute=None):
+        """Presence, visibility and (optional) attribute value of an element in a single round trip"""
+        locator_value, by_type = self.__detect_locator(element_locator)
+        if locator_value is None:
+            return {"present": False, "displayed": False, "attribute": None}
+        return self._driver.execute_script(ELEMENT_STATE_SCRIPT, by_type, locator_value, attribute)
+
     @gauge_wrap
     def wait_for_element_displayed(self, element_locator, timeout_in_seconds=None, show_log=True):
         """Wait for element to display
@@ -494,25 +516,19 @@ class BasePage(object):
         start_time = time.time()
         timeout = max(timeout_in_seconds, 0) if timeout_in_seconds is not None else self.__DEFAULT_TIMEOUT
         try:
-            while time.time() - start_time - 1 <= timeout and (self.find_element(element_locator, 1, False) is None or not self.find_element(element_locator, 1, False).is_displayed()):
-                pass
-            if self.find_element(element_locator, 1, False) is None:
+            result, state, _ = Poller().until(lambda: self.__get_element_state(element_locator), timeout, lambda state: state["displayed"])
+            if state is None or not state["present"]:
                 message = f"Element «{element_locator}» is NOT found after {time.time() - start_time:.3f} seconds !!!"
-                result = False
-            elif not self.find_element(element_locator, 1, False).is_displayed():
+            elif not result:
                 message = f"Element «{element_locator}» is still NOT displayed after waiting {time.time() - start_time:.3f} seconds !!!"
-                result = False
             else:
                 message = f"Element «{element_locator}» is displayed after waiting {time.time() - start_time:.3f} seconds !!!"
-                result = True
             if show_log:
                 logger.debug(message)
                 if data_store.suite.license:
                     Messages.write_message(message)
             return result
         except Exception as exception:
-            if type(exception).__name__ in ["StaleElementReferenceException"]:
-                return self.wait_for_element_displayed(element_locator, timeout_in_seconds=timeout - (time.time() - start_time + 1))
             logger.error(exception)
             return False
 
@@ -529,29 +545,22 @@ class BasePage(object):
         try:
             start_time = time.time()
             timeout = max(timeout_in_seconds, 0) if timeout_in_seconds is not None else self.__DEFAULT_TIMEOUT
-            self.wait_for_element_displayed(element_locator, timeout, False)
-            if self.find_element(element_locator, 1, False) is None:
-                message = f"Element «{element_locator}» is NOT existed after waiting {time.time() - start_time:.3f} seconds!!!"
-                result = False
-            while time.time() - start_time - 1 <= timeout and self.wait_for_element_displayed(element_locator, 1, show_log=False):
-                pass
-            if self.find_element(element_locator, 1, False) is None:
+            poller = Poller()
+            # Let the element show up first, so it is not reported as disappeared before it is displayed
+            poller.until(lambda: self.__get_element_state(element_locator), timeout, lambda state: state["displayed"])
+            result, state, _ = poller.until(lambda: self.__get_element_state(element_locator), timeout - (time.time() - start_time), lambda state: not state["displayed"])
+            if result and not state["present"]:
                 message = f"Element «{element_locator}» is disappeared after waiting {time.time() - start_time:.3f} seconds !!!"
-                result = True
-            elif self.find_element(element_locator, 1, False).is_displayed():
-                message = f"Element «{element_locator}» is still displayed after waiting {time.time() - start_time:.3f} seconds!!!"
-                result = False
-            else:
+            elif result:
                 message = f"Element «{element_locator}» is disappeared after {time.time() - start_time:.3f} seconds!!!"
-                result = True
+            else:
+                message = f"Element «{element_locator}» is still displayed after waiting {time.time() - start_time:.3f} seconds!!!"
             if show_log:
                 logger.debug(message)
                 if data_store.suite.license:
                     Messages.write_message(message)
             return result
         except Exception as exception:
-            if type(exception).__name__ in ["StaleElementReferenceException"]:
-                return self.wait_for_element_disappeared(element_locator, timeout_in_seconds=timeout - (time.time() - start_time + 1))
             logger.error(exception)
             return False
 
@@ -569,16 +578,15 @@ class BasePage(object):
         try:
             start_time = time.time()
             timeout = max(timeout_in_seconds, 0) if timeout_in_seconds is not None else self.__DEFAULT_TIMEOUT
-            beginning_attribute_value = self.get_attribute(element_locator, attribute, timeout - (time.time() - start_time + 1))
+            poller = Poller()
+            _, state, _ = poller.until(lambda: self.__get_element_state(element_locator, attribute), timeout, lambda state: state["present"])
+            beginning_attribute_value = state["attribute"] if state is not None else None
             if beginning_attribute_value is not None:
-                while time.time() - start_time - 1 <= timeout and self.get_attribute(element_locator, attribute, 1) == beginning_attribute_value:
-                    pass
-                if self.get_attribute(element_locator, attribute, 1) != beginning_attribute_value:
+                result, _, _ = poller.until(lambda: self.__get_element_state(element_locator, attribute), timeout - (time.time() - start_time), lambda state: state["attribute"] != beginning_attribute_value)
+                if result:
                     message = f'Attribute "{attribute}" of Element «{element_locator}» has been changed after waiting {time.time() - start_time:.3f} seconds!!!'
-                    result = True
                 else:
                     message = f'Attribute "{attribute}" of Element «{element_locator}» has NOT been changed after waiting {time.time() - start_time:.3f} seconds!!!'
-                    result = False
             else:
                 message = f'Attribute "{attribute}" of Element «{element_locator}» is NOT existed !!!'
                 result = False
@@ -739,19 +747,8 @@ class BasePage(object):
             list: color list
         """
         try:
-            result = []
-            img = Image.open(BytesIO(base64.b64decode(element.screenshot_as_base64)))
-            pixel_count = img._size[0] * img._size[1]
-            list_color = img.getcolors(256**2 * 256)
-            list_color.sort(reverse=True)
-            for color in list_color:
-                color_red = hex(color[1][0]).replace("0x", "0")[-2:].upper()
-                color_green = hex(color[1][1]).replace("0x", "0")[-2:].upper()
-                color_blue = hex(color[1][2]).replace("0x", "0")[-2:].upper()
-                obj = (round(color[0] * 100 / pixel_count, 3), f"#{color_red}{color_green}{color_blue}", color_names.find(f"#{color_red}{color_green}{color_blue}"))
-                result.append(obj)
-            img.close()
-            return result[:number_of_colors]
+            with Image.open(BytesIO(base64.b64decode(element.screenshot_as_base64))) as img:
+                return get_color_histogram(img, number_of_colors)
         except Exception as exception:
             logger.error(exception)
 
@@ -760,25 +757,29 @@ class BasePage(object):
         element = self.find_element(element_locator)
         return self.__get_color_names_of_element(element, number_of_color_names)
 
+    @gauge_wrap
+    def get_dominant_colors(self, element_locator, k=5):
+        """
+        Get the k dominant colors of an element, similar colors (anti-aliasing, gradients) are clustered together in Lab space
+        e.g. (56.361, '#FFBB00', 'Selective Yellow') means Selective Yellow and its shades displayed as 56.361% in the image
+        Args:
+            element_locator (Locator)
+            k (int, optional): [Number of colors to get]. Defaults to 5.
+        Returns:
+            list: color list, biggest first
+        """
+        try:
+            element = self.find_element(element_locator)
+            with Image.open(BytesIO(base64.b64decode(element.screenshot_as_base64))) as img:
+                return get_dominant_colors(img, k)
+        except Exception as exception:
+            logger.error(exception)
+
     @gauge_wrap
     def __get_color_names_of_element(self, element, number_of_color_names=10):
         try:
-            temp = []
-            color_list = []
-            result = []
-            colors = self.__get_colors_of_element(element, 1000)
-            for color in colors:
-                obj = (color[0], color_names.find(color[1]))
-                temp.append(obj)
-            for color in temp:
-                if color[1] not in color_list:
-                    color_list.append(color[1])
-            for color in color_list:
-                count = sum(obj[0] for obj in temp if color == obj[1])
-                count = 0.001 if round(count, 3) == 0.0 else round(count, 3)
-                result.append((count, color))
-            result.sort(reverse=True)
-            return result[:number_of_color_names]
+            with Image.open(BytesIO(base64.b64decode(element.screenshot_as_base64))) as img:
+                return get_color_name_histogram(img, number_of_color_names)
         except Exception as exception:
             logger.error(exception)
 
@@ -969,17 +970,37 @@ class BasePage(object):
             logger.error(exception)
 
     @gauge_wrap
-    def navigate(self, url: str, wait_for_page_loaded=True, show_log=True):
+    def navigate(self, url: str, wait_for_page_loaded=True, show_log=True, wait_strategy: str = None):
         """
         Navigate to a url in the current browser session.
+        Args:
+            wait_strategy (str, optional): [load: wait for document.readyState complete | network_idle: wait for no request in flight].
+                Defaults to the page_wait_strategy setting.
         """
         try:
             if self._driver is None:
                 return False
             logger.debug(f"Navigating to {url} ....!!!")
+            wait_strategy = (wait_strategy or os.getenv("page_wait_strategy", "load")).lower()
+            temporary_capture = False
+            if wait_for_page_loaded and wait_strategy == "network_idle":
+                # Forget the requests of the previous page before loading the new one
+                self.update_archived_request_headers()
+                temporary_capture = not is_subscribed(self._driver) and not is_network_capture_on(self._driver)
+                if temporary_capture:
+                    start_network_capture(self._driver)
+                elif is_subscribed(self._driver):
+                    self._driver.__dict__["event_tracker"].reset()
+                else:
+                    get_performance_log(self._driver).tracker.reset()
             self._driver.get(url)
             if wait_for_page_loaded:
-                self.wait_for_page_loaded(show_log=show_log)
+                if wait_strategy == "network_idle":
+                    self.wait_for_network_idle(show_log=show_log)
+                else:
+                    self.wait_for_page_loaded(show_log=show_log)
+            if temporary_capture:
+                stop_network_capture(self._driver)
             return True
         except Exception as exception:
             logger.error(exception)
@@ -1015,15 +1036,8 @@ class BasePage(object):
     def get_current_loc(self, time_out=30):
         try:
             self._driver.execute_script('const options = { enableHighAccuracy: true, timeout: 30000, maximumAge: 0}; function success(position) { const elem = document.createElement("input"); elem.type = "hidden"; elem.id = "log_location"; elem.innerText="Loc Success: " + position.coords.latitude + "," + position.coords.longitude; document.body.appendChild(elem);}function error(err) { const elem = document.createElement("input"); elem.type = "hidden"; elem.id = "error_location"; elem.innerText = err.message; document.body.appendChild(elem);} navigator.geolocation.getCurrentPosition(success, error, options);')
-            start = time.time()
-            while (time.time() - start) < time_out:
-                loc = self.find_element("log_location", 3, show_log=False)
-                err = self.find_element("error_location", 3, show_log=False)
-                if loc:
-                    return loc.get_attribute("innerText")
-                if err:
-                    return err.get_attribute("innerText")
-            return None
+            _, result, _ = Poller().until(lambda: self._driver.execute_script('var elem = document.getElementById("log_location") || document.getElementById("error_location"); return elem ? elem.innerText : null;'), time_out)
+            return result
         except Exception:
             return None
 
@@ -1044,9 +1058,7 @@ class BasePage(object):
                     if data_store.suite.license:
                         Messages.write_message(message)
                 return False
-            current_state = self.__get_current_ready_state()
-            while time.time() - start_time <= timeout and current_state not in ["complete"]:
-                current_state = self.__get_current_ready_state()
+            current_state = wait_for_ready_state(self._driver, ["complete"], timeout - (time.time() - start_time)) or self.__get_current_ready_state()
             if current_state in ["driver failed", "not found"]:
                 return current_state
             elapsed_time = min(time.time() - start_time, timeout)
@@ -1068,6 +1080,57 @@ class BasePage(object):
             else:
                 logger.error(exception)
 
+    @gauge_wrap
+    def wait_for_network_idle(self, idle_ms: int = 500, max_inflight: int = 0, timeout_in_seconds: int = None, show_log=True):
+        """
+        Wait until at most max_inflight requests are in flight and no request has started or ended for idle_ms milliseconds.
+        Requests are tracked from the Network.* events of the performance log (requestWillBeSent, loadingFinished, loadingFailed).
+        Args:
+            idle_ms (int, optional): [Quiet time in milliseconds]. Defaults to 500.
+            max_inflight (int, optional): [Requests allowed to stay in flight, e.g. long polling]. Defaults to 0.
+            timeout_in_seconds (int, optional): Defaults to 60.
+        Returns:
+            True if the network is idle else False
+        """
+        try:
+            start_time = time.time()
+            timeout = timeout_in_seconds if timeout_in_seconds is not None else 60
+            if self._driver is None or timeout <= 0:
+                return False
+            subscribed = is_subscribed(self._driver)
+            performance_log = get_performance_log(self._driver)
+            tracker = self._driver.__dict__["event_tracker"] if subscribed else performance_log.tracker
+            temporary_capture = not subscribed and not is_network_capture_on(self._driver)
+            if temporary_capture:
+                # The requests started before are unknown, only the ones from now on are tracked
+                start_network_capture(self._driver)
+
+            def is_network_idle():
+                # Subscribed events are pushed by the browser, there is nothing to read
+                if not subscribed:
+                    performance_log.read()
+                return tracker.is_idle(idle_ms, max_inflight)
+
+            result, _, _ = Poller(interval=min(idle_ms / 1000, 0.1)).until(is_network_idle, timeout)
+            if temporary_capture:
+                stop_network_capture(self._driver)
+            elapsed_time = time.time() - start_time
+            if result:
+                message = f"Network of page {self._driver.current_url} is idle after {elapsed_time:.3f} seconds"
+            else:
+                message = f"Network of page {self._driver.current_url} is still busy ({len(tracker.inflight)} request(s) in flight) after {elapsed_time:.3f} seconds !!!"
+            if show_log:
+                if result:
+                    logger.debug(message)
+                else:
+                    logger.warning(message)
+                if data_store.suite.license:
+                    Messages.write_message(message)
+            return result
+        except Exception as exception:
+            logger.error(exception)
+            return False
+
     @gauge_wrap
     def wait_for_page_changes_state(self, timeout_in_seconds: int = 30, show_log=True):
         try:
@@ -1081,11 +1144,10 @@ class BasePage(object):
             if timeout <= 0:
                 return 0
             first_state = self.__get_current_ready_state()
-            current_state = first_state
-            while time.time() - start_time <= timeout:
-                current_state = self.__get_current_ready_state()
-                if current_state != first_state:
-                    break
+            if first_state in READY_STATES:
+                current_state = wait_for_ready_state(self._driver, [state for state in READY_STATES if state != first_state], timeout - (time.time() - start_time)) or first_state
+            else:
+                _, current_state, _ = Poller().until(self.__get_current_ready_state, timeout - (time.time() - start_time), lambda state: state != first_state)
             if current_state == first_state and show_log:
                 message = f"Page does NOT change state over {time.time() - start_time:.3f} seconds !!!"
                 logger.warning(message)
@@ -1109,21 +1171,21 @@ class BasePage(object):
                 return False
             start_time = time.time()
             if self._driver.caps.get("pageLoadStrategy").lower() != "none":
-                tmp = self._driver.page_source
+                # Any command waits for the page to load with this strategy, no need to pull the page source
+                self._driver.execute_script("return document.readyState")
                 return time.time() - start_time
             timeout = timeout_in_seconds if timeout_in_seconds is not None else 30
             if timeout <= 0:
                 return 0
-            first_ps = self._driver.page_source
-            while time.time() - start_time <= timeout:
-                if first_ps != self._driver.page_source:
-                    if show_log:
-                        tmp = min((time.time() - start_time), timeout)
-                        message = f"Page source has been changed after {tmp:.3f} seconds !!!"
-                        logger.debug(message)
-                        if data_store.suite.license:
-                            Messages.write_message(message)
-                    return time.time() - start_time
+            changed, _ = wait_for_dom_change(self._driver, timeout - (time.time() - start_time))
+            if changed:
+                if show_log:
+                    tmp = min((time.time() - start_time), timeout)
+                    message = f"Page source has been changed after {tmp:.3f} seconds !!!"
+                    logger.debug(message)
+                    if data_store.suite.license:
+                        Messages.write_message(message)
+                return time.time() - start_time
 
             if show_log:
                 tmp = min((time.time() - start_time), timeout)
@@ -1140,16 +1202,11 @@ class BasePage(object):
     @gauge_wrap
     def get_page_title(self, timeout_in_seconds: int = None):
         try:
-            start_time = time.time()
-            elapsed_time = time.time() - start_time
             timeout = timeout_in_seconds if timeout_in_seconds is not None else 30
             if timeout <= 0:
                 return None
-            while len(self._driver.title) == 0:
-                elapsed_time = time.time() - start_time
-                if elapsed_time >= timeout:
-                    break
-            return self._driver.title
+            _, title, _ = Poller().until(lambda: self._driver.title, timeout)
+            return title if title is not None else self._driver.title
         except Exception as exception:
             logger.warning(exception)
             if data_store.suite.license:
@@ -1272,29 +1329,105 @@ class BasePage(object):
     @gauge_wrap
     def get_value_from_archived_request_headers(self, key="Authorization"):
         try:
-            logs = data_store.spec.archived_headers
-            result = []
-            for entry in logs:
-                if entry.get(key.lower()):
-                    result.append(entry.get(key.lower()))
-            result = list(dict.fromkeys(result))
-            if result:
-                return result
-            else:
-                return None
+            return data_store.spec.archived_headers.get(key)
         except Exception as exception:
             logger.warning(exception)
             if data_store.suite.license:
                 Messages.write_message(exception)
             return None
 
+    @gauge_wrap
+    def get_console_messages(self, level: str = None):
+        """
+        Console messages of the spec received through the BiDi event subscription (bidi_events setting)
+        Args:
+            level (str, optional): [debug | info | warn | error]. Defaults to all levels.
+        Returns:
+            list: [{"time", "event", "level", "text", "url"}]
+        """
+        try:
+            return get_event_buffers().get("console", lambda event: level is None or event["level"] == level)
+        except Exception as exception:
+            logger.error(exception)
+            return []
+
+    @gauge_wrap
+    def get_network_responses(self, url_pattern: str = None):
+        """
+        Network responses of the spec received through the BiDi event subscription (bidi_events setting)
+        Returns:
+            list: [{"time", "event", "request_id", "url", "method", "status", "headers"}]
+        """
+        try:
+            return get_event_buffers().get("network", match_url(url_pattern))
+        except Exception as exception:
+            logger.error(exception)
+            return []
+
+    @gauge_wrap
+    def wait_for_navigation(self, url_pattern: str = None, timeout_in_seconds: int = None, since: float = None, show_log=True):
+        """
+        Wait for a page (matching url_pattern) to be loaded, from the BiDi navigation events of the spec (bidi_events setting)
+        Args:
+            since (float, optional): [Epoch seconds, older events are ignored]. Defaults to now.
+        Returns:
+            dict: the browsingContext.load event, None if no page is loaded in time
+        """
+        try:
+            start_time = time.time()
+            timeout = timeout_in_seconds if timeout_in_seconds is not None else 30
+            url_matches = match_url(url_pattern)
+            event = get_event_buffers().wait_for("navigation", lambda event: event["event"] == "browsingContext.load" and url_matches(event), timeout, start_time if since is None else since)
+            if show_log:
+                if event is not None:
+                    message = f"Page {event['url']} is loaded after waiting {time.time() - start_time:.3f} seconds"
+                    logger.debug(message)
+                else:
+                    message = f"No page {url_pattern or ''} is loaded after waiting {time.time() - start_time:.3f} seconds !!!"
+                    logger.warning(message)
+                if data_store.suite.license:
+                    Messages.write_message(message)
+            return event
+        except Exception as exception:
+            logger.error(exception)
+            return None
+
+    @gauge_wrap
+    def start_network_capture(self, url_pattern: str = None, methods: list = None):
+        """
+        Capture the network events of the browser (request headers, in-flight requests) until stop_network_capture
+        Args:
+            url_pattern (str, optional): [Regex, only the requests with a matching url are kept for the header readers]
+            methods (list, optional): [Network.* event names to keep]. Defaults to the request events.
+        """
+        try:
+            return start_network_capture(self._driver, url_pattern, methods)
+        except Exception as exception:
+            logger.error(exception)
+            return False
+
+    @gauge_wrap
+    def stop_network_capture(self):
+        try:
+            self.update_archived_request_headers()
+            return stop_network_capture(self._driver)
+        except Exception as exception:
+            logger.error(exception)
+            return False
+
     @gauge_wrap
     def get_network_request_headers(self, method="Network.request"):
         try:
-            logs = self._driver.get_log("performance")
+            if is_subscribed(self._driver) and not is_network_capture_on(self._driver):
+                # The request headers of BiDi events are archived as they come
+                result = [event["headers"] for event in get_event_buffers().get("request") if event["headers"]]
+                return [dict(t) for t in {tuple(d.items()) for d in result}]
+            if not is_network_capture_on(self._driver):
+                logger.warning("Network capture is off, please use start_network_capture or $network_capture = True in the spec !!!")
+                return []
+            logs = get_performance_log(self._driver).take_messages()
             result = []
-            for entry in logs:
-                log = json.loads(entry["message"])["message"]
+            for log in logs:
                 if method.lower() in log["method"].lower():
                     if log.get("params"):
                         if log.get("params").get("headers"):
@@ -1314,10 +1447,8 @@ class BasePage(object):
     @gauge_wrap
     def update_archived_request_headers(self):
         try:
-            headers = self.get_network_request_headers()
-            if headers:
-                data_store.spec.archived_headers = data_store.spec.archived_headers + headers
-                data_store.spec.archived_headers = [dict(t) for t in {tuple(d.items()) for d in data_store.spec.archived_headers}]
+            if is_network_capture_on(self._driver):
+                data_store.spec.archived_headers.add_all(self.get_network_request_headers())
         except Exception as exception:
             logger.warning(exception)
             if data_store.suite.license:
@@ -1394,3 +1525,4 @@ def get_download_directory(driver):
     except Exception as exception:
         logger.error(exception)
         return None
+
@@ -1,5 +1,6 @@
 import base64
 import json
+import os
 import platform
 import time
 from io import BytesIO
@@ -13,8 +14,10 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
-from .utils import color_names, gauge_wrap, logger
+from .utils import gauge_wrap, logger
 from .utils.adb_util import ADBUtil
+from .utils.color_util import get_color_histogram, get_color_name_histogram, get_dominant_colors
+from .utils.image_util import find_images
 from .utils.string_util import StringUtil
 
 # ====================================================================================================
@@ -138,20 +141,8 @@ class BaseScreen(object):
         try:
             if element is None:
                 return None
-            result = []
-            # img = Image.open(BytesIO(base64.b64decode(element.screenshot_as_base64)))
             with Image.open(BytesIO(base64.b64decode(element.screenshot_as_base64))) as img:
-                pixel_count = img._size[0] * img._size[1]
-                list_color = img.getcolors(256**2 * 256)
-                list_color.sort(reverse=True)
-                for color in list_color:
-                    color_red = hex(color[1][0]).replace("0x", "0")[-2:].upper()
-                    color_green = hex(color[1][1]).replace("0x", "0")[-2:].upper()
-                    color_blue = hex(color[1][2]).replace("0x", "0")[-2:].upper()
-                    obj = (round(color[0] * 100 / pixel_count, 3), f"#{color_red}{color_green}{color_blue}", color_names.find(f"#{color_red}{color_green}{color_blue}"))
-                    result.append(obj)
-            # img.close()
-            return result[:number_of_colors]
+                return get_color_histogram(img, number_of_colors)
         except Exception as exception:
             logger.error(exception)
             return None
@@ -161,22 +152,8 @@ class BaseScreen(object):
         try:
             if element is None:
                 return None
-            temp = []
-            color_list = []
-            result = []
-            colors = self.__get_colors_of_element(element, 1000)
-            for color in colors:
-                obj = (color[0], color_names.find(color[1]))
-                temp.append(obj)
-            for color in temp:
-                if color[1] not in color_list:
-                    color_list.append(color[1])
-            for color in color_list:
-                count = sum(obj[0] for obj in temp if color == obj[1])
-                count = 0.001 if round(count, 3) == 0.0 else round(count, 3)
-                result.append((count, color))
-            result.sort(reverse=True)
-            return result[:number_of_color_names]
+            with Image.open(BytesIO(base64.b64decode(element.screenshot_as_base64))) as img:
+                return get_color_name_histogram(img, number_of_color_names)
         except Exception as exception:
             logger.error(exception)
             return None
@@ -652,6 +629,47 @@ class BaseScreen(object):
         element = self.find_element(element_locator)
         return self.__get_color_names_of_element(element, number_of_color_names)
 
+    @gauge_wrap
+    def get_dominant_colors(self, element_locator, k=5):
+        """
+        Get the k dominant colors of an element, similar colors (anti-aliasing, gradients) are clustered together in Lab space
+        e.g. (56.361, '#FFBB00', 'Selective Yellow') means Selective Yellow and its shades displayed as 56.361% in the image
+        Args:
+            element_locator (Locator)
+            k (int, optional): [Number of colors to get]. Defaults to 5.
+        Returns:
+            list: color list, biggest first
+        """
+        try:
+            element = self.find_element(element_locator)
+            if element is None:
+                return None
+            with Image.open(BytesIO(base64.b64decode(element.screenshot_as_base64))) as img:
+                return get_dominant_colors(img, k)
+        except Exception as exception:
+            logger.error(exception)
+            return None
+
+    @gauge_wrap
+    def find_images(self, baseline_images: list, confidence: int = 85):
+        """
+        Find several baseline images in one screenshot, e.g. to detect which of several dialogs is showing
+        Args:
+            baseline_images (list): [Paths of baseline images]
+            confidence (int, optional): [Minimum score (0-100) of a match]. Defaults to 85.
+        Returns:
+            dict: {baseline image: ImageMatch (box is None if the image is not found)}
+        """
+        try:
+            for baseline_image in [baseline_image for baseline_image in baseline_images if not os.path.exists(baseline_image)]:
+                logger.warning(f"«{baseline_image}» is not existed !!!")
+            baseline_images = [baseline_image for baseline_image in baseline_images if os.path.exists(baseline_image)]
+            with Image.open(BytesIO(base64.b64decode(self._driver.get_screenshot_as_base64()))) as full_img:
+                return find_images(baseline_images, full_img, [100, 50, 200], confidence)
+        except Exception as exception:
+            logger.error(exception)
+            return None
+
     @gauge_wrap
     def get_element_all_attributes(self, element):
         try:
@@ -1,16 +1,17 @@
 import ast
-import base64
 import contextlib
 import json
 import os
 import pathlib
 import re
 import shutil
+import threading
 import time
 
 # import time
 import unicodedata
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from io import BytesIO
 from os import fdopen, remove
@@ -22,21 +23,39 @@ import psutil
 import toml
 from getgauge.python import ExecutionContext, Messages, Screenshots, after_scenario, after_spec, after_step, after_suite, before_scenario, before_spec, before_step, before_suite, continue_on_failure, custom_screenshot_writer, data_store
 from getgauge.util import get_project_root
-from PIL import Image
+from PIL import Image, ImageDraw, ImageStat
 from selenium.webdriver.chrome.webdriver import WebDriver
 
 from .base_page import WebPage, WebPage2, WebPage3
 from .base_screen import MobileScreen
-from .utils import color_names, gauge_wrap, logger
-from .utils.browser_util import BrowserUtil, ChromeOpts
+from .utils import collect_messages, gauge_wrap, logger, write_message
+from .utils.API_request import close_sessions
+from .utils.browser_util import BrowserUtil, ChromeOpts, ChromeSessionPool
+from .utils.event_util import subscribe_events
+from .utils.latency_util import get_latency_table
+from .utils.network_util import HeaderArchive, is_network_capture_on, start_network_capture, stop_network_capture
+from .utils.page_class_resolver import PageClassResolver
+from .utils.schema_util import load_schemas
+from .utils.screenshot_store import ScreenshotStore
+from .utils.screenshot_writer import ScreenshotWriter
+from .utils.step_index import ConceptIndex, StepIndex, get_spec_dirs, get_step_impl_dirs
 from .utils.string_util import StringUtil
 
 # ==================================================================================================
 # Gauge Execution Hooks
 # ==================================================================================================
 PROJECT_PATH = get_project_root()
+CACHE_PATH = os.path.join(PROJECT_PATH, ".autocore_cache")
 GHRP = "GAUGE_HTML_REPORT_THEME_PATH"
 data_store.suite.license = True
+DRIVER_SLOTS = {
+    "webpage": ("web", WebPage),
+    "webpage2": ("web2", WebPage2),
+    "webpage3": ("web3", WebPage3),
+    "mobilescreen": ("mobile", MobileScreen),
+}
+DRIVER_WARM_UP_POOL = ThreadPoolExecutor(max_workers=len(DRIVER_SLOTS), thread_name_prefix="driver-warm-up")
+SCREENSHOT_FORMATS = {"png": ("PNG", ".png"), "jpeg": ("JPEG", ".jpg"), "jpg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
 
 
 class BaseHook:
@@ -49,11 +68,14 @@ class BaseHook:
         logger.opt(colors=True).info("<i><fg 206>■■■■■■■■■■■■■■■■■■■■■■■■■■■■■■  START TESTING  ■■■■■■■■■■■■■■■■■■■■■■■■■■■■■■</fg 206></i>")
         data_store.suite.able_to_run = True
         init_config()
+        init_step_index()
 
     @staticmethod
     @before_spec
     def before_spec_hook(context: ExecutionContext):
         init_spec_data(context)
+        refresh_step_index()
+        init_spec_driver_warm_up(context)
 
     @staticmethod
     @before_scenario
@@ -75,6 +97,7 @@ class BaseHook:
         # if not data_store.suite.license and not context.step.is_failing:
         #     Screenshots.capture_screenshot()
         data_store.suite.able_to_run = True
+        resume_spec_driver_warm_up(context)
 
     @staticmethod
     @after_scenario
@@ -85,7 +108,10 @@ class BaseHook:
     @after_spec
     def after_spec_hook(context: ExecutionContext):
         try:
-            clean_up_all_web_drivers()
+            if data_store.suite.get("chrome_session_pool") is not None:
+                release_all_web_drivers()
+            else:
+                clean_up_all_web_drivers()
         except Exception as exception:
             logger.error(exception)
 
@@ -93,7 +119,11 @@ class BaseHook:
     @after_suite
     def after_suite_hook(context: ExecutionContext):
         clean_up_all_web_drivers()
+        clean_up_chrome_session_pool()
         clean_up_mobile_driver()
+        drain_screenshot_writer()
+        close_sessions()
+        write_latency_summary()
         # write_log()
         logger.opt(colors=True).info("<i><fg 206>■■■■■■■■■■■■■■■■■■■■■■■■■■■■■■  END TESTING  ■■■■■■■■■■■■■■■■■■■■■■■■■■■■■■</fg 206></i>")
 
@@ -103,9 +133,43 @@ class BaseHook:
 # ==================================================================================================
 def init_config():  # sourcery skip: extract-method
     init_mobile_platform()
+    data_store.suite.driver_futures = {}
     data_store.suite.capture_element_screenshot = None
     config_report_settings()
     data_store.suite.chrome_options = None
+    init_chrome_session_pool()
+    init_json_schemas()
+
+
+def init_chrome_session_pool():
+    try:
+        data_store.suite.chrome_session_pool = None
+        if os.getenv("chrome_session_pool", "false").strip().lower() == "true":
+            data_store.suite.chrome_session_pool = ChromeSessionPool(max_reuse=int(os.getenv("chrome_session_pool_max_reuse", "20")))
+    except Exception as exception:
+        logger.error(exception)
+
+
+def write_latency_summary():
+    """Write the API latency percentiles of the suite by endpoint to the log and the report"""
+    try:
+        table = get_latency_table("suite")
+        if table is not None:
+            logger.info(f"API latency:\n{table}")
+            if data_store.suite.license:
+                Messages.write_message(f"API latency:\n{table}")
+    except Exception as exception:
+        logger.error(exception)
+
+
+def init_json_schemas():
+    """Compile the JSON schemas of json_schema_dir (relative to the project) once for APIRequest.validate_schema"""
+    try:
+        schema_dir = os.getenv("json_schema_dir", "").strip()
+        if schema_dir:
+            load_schemas(os.path.join(get_project_root(), schema_dir))
+    except Exception as exception:
+        logger.error(exception)
 
 
 def set_mobile_platform_name(udid):
@@ -133,7 +197,7 @@ def init_chrome_driver(download_folder="web_default", user_profile_dir: str = No
         if chrome_driver is not None and data_store.suite.license:
             message = f"- Testing on {chrome_driver.caps.get('browserName').capitalize()} {chrome_driver.caps.get('browserVersion')}"
             logger.debug(message)
-            Messages.write_message(message)
+            write_message(message)
 
         return chrome_driver
     except Exception as exception:
@@ -170,9 +234,9 @@ def init_mobile_driver(desired_capabilities=None):
         if mobile_driver is not None:
             if data_store.suite.license:
                 if mobile_driver.caps.get("platformName").lower() == "android":
-                    Messages.write_message(f"Testing on {mobile_driver.caps.get('deviceModel')} ({mobile_driver.caps.get('platformName')} {mobile_driver.caps.get('platformVersion')}) ({mobile_driver.caps.get('udid')})")
+                    write_message(f"Testing on {mobile_driver.caps.get('deviceModel')} ({mobile_driver.caps.get('platformName')} {mobile_driver.caps.get('platformVersion')}) ({mobile_driver.caps.get('udid')})")
                 else:
-                    Messages.write_message(f"Testing on {mobile_driver.caps.get('deviceName')} ({mobile_driver.caps.get('platformName')} {mobile_driver.caps.get('platformVersion')}) ({mobile_driver.caps.get('udid')})")
+                    write_message(f"Testing on {mobile_driver.caps.get('deviceName')} ({mobile_driver.caps.get('platformName')} {mobile_driver.caps.get('platformVersion')}) ({mobile_driver.caps.get('udid')})")
 
             return mobile_driver
         else:
@@ -187,94 +251,223 @@ def init_mobile_driver(desired_capabilities=None):
 
 @custom_screenshot_writer
 def take_screenshot():
-    log_message = True
-    tc_id = data_store.spec.test_case_id if "test_case_id" in data_store.spec else None
     if ((time.time() - data_store.suite.capture_element_screenshot_time) < 0.001) and data_store.suite.capture_element_screenshot is not None:
         # ==================================================================================================
         # Capture element screenshot
         # ==================================================================================================
         try:
             image = data_store.suite.capture_element_screenshot.screenshot_as_png
-            file_name = os.path.join(
-                os.getenv("gauge_screenshots_dir"),
-                f"screenshot-{tc_id}-{StringUtil.base36encode(uuid1().int)}.png",
-            )
-            with open(file_name, "wb") as file:
-                file.write(image)
-            message = f"Your element screenshot has been saved at: {file_name}"
-            logger.debug(message)
+            store = get_screenshot_store()
+            file_name, is_new = reserve_screenshot_file(store, [image], prefix="element")
+            if is_new:
+                get_screenshot_writer().submit(write_screenshot_once, store, file_name, [image], write_element_screenshot, file_name, image)
             return os.path.basename(file_name)
         except Exception as exception:
             logger.error(exception)
         finally:
             data_store.suite.capture_element_screenshot = None
     else:
-        list_image = []
         # ==================================================================================================
         # Capture all pages screenshots
         # ==================================================================================================
         try:
-            if hasattr(data_store.suite, "web") and data_store.suite["web"] is not None:
-                append_screenshot(data_store.suite["web"], tc_id, list_image)
-            if hasattr(data_store.suite, "web2") and data_store.suite["web2"] is not None:
-                append_screenshot(data_store.suite["web2"], tc_id, list_image)
-            if hasattr(data_store.suite, "web3") and data_store.suite["web3"] is not None:
-                append_screenshot(data_store.suite["web3"], tc_id, list_image)
-            if hasattr(data_store.suite, "mobile") and data_store.suite["mobile"] is not None:
-                append_screenshot(data_store.suite["mobile"], tc_id, list_image)
-
-            if list_image:
-                images = [Image.open(x) for x in list_image]
-                widths, heights = zip(*(i.size for i in images))
-                max_height = max(heights)
-                resized_images = [im.resize((int(im.size[0] * max_height / im.size[1]), max_height)) for im in images]
-
-                widths, heights = zip(*(i.size for i in resized_images))
-                total_width = sum(widths)
-                new_im = Image.new("RGB", (total_width, max_height), (256, 256, 256))
-                x_offset = 0
-                for im in resized_images:
-                    new_im.paste(im, (x_offset, 0))
-                    x_offset += im.size[0]
-                file_name = os.path.join(
-                    os.getenv("gauge_screenshots_dir"),
-                    f"screenshot-{tc_id}-{StringUtil.base36encode(uuid1().int)}.png",
-                )
-
-                new_im.save(file_name)
-                for im in list_image:
-                    os.remove(im)
-            else:
-                new_im = Image.new("RGB", (1, 1), (256, 256, 256))
-                file_name = os.path.join(
-                    os.getenv("gauge_screenshots_dir"),
-                    f"screenshot-{tc_id}-{StringUtil.base36encode(uuid1().int)}.png",
-                )
-                new_im.save(file_name)
-                log_message = False
-
-            new_im.close()
-            message = f"Your screenshot has been saved at: {file_name}"
-            if log_message:
-                logger.debug(message)
+            list_image = capture_all_screenshots(float(os.getenv("screenshot_timeout", "5")))
+            store = get_screenshot_store()
+            file_name, is_new = reserve_screenshot_file(store, list_image)
+            if is_new:
+                get_screenshot_writer().submit(write_screenshot_once, store, file_name, list_image, write_composite_screenshot, file_name, list_image)
             return os.path.basename(file_name)
         except Exception as exception:
             logger.error(exception)
 
 
-def append_screenshot(driver: WebDriver, tc_id, list_image):
+def get_screenshot_store():
+    """
+    The ScreenshotStore of the current spec with screenshot_dedup, None otherwise.
+    Near-identical captures (screenshot_dedup_distance >= 0) are only matched within the spec.
+    """
+    if os.getenv("screenshot_dedup", "true").lower() != "true":
+        return None
+    if not hasattr(data_store.spec, "screenshot_store") or data_store.spec.screenshot_store is None:
+        data_store.spec.screenshot_store = ScreenshotStore(
+            os.getenv("gauge_screenshots_dir"),
+            max_distance=int(os.getenv("screenshot_dedup_distance", "-1")),
+        )
+    return data_store.spec.screenshot_store
+
+
+def reserve_screenshot_file(store, tiles, prefix="screenshot"):
+    """
+    Return (file_name, is_new) of a capture.
+    With a store, byte-identical captures share one content-addressed file which is written once.
+    """
+    extension = get_screenshot_format()[1]
+    tc_id = data_store.spec.test_case_id if "test_case_id" in data_store.spec else None
+    if store is not None:
+        return store.reserve(tiles, extension, prefix, tc_id)
+    return os.path.join(os.getenv("gauge_screenshots_dir"), f"{prefix}-{tc_id}-{StringUtil.base36encode(uuid1().int)}{extension}"), True
+
+
+def write_screenshot_once(store, file_name, tiles, write_function, *args):
+    """Writer job: link file_name to a near-identical screenshot of the spec if there is one, write it otherwise"""
+    similar_file_name, dhashes = store.find_similar(tiles, file_name) if store is not None else (None, None)
+    if similar_file_name is not None:
+        try:
+            os.link(similar_file_name, file_name)
+        except OSError:
+            shutil.copyfile(similar_file_name, file_name)
+        logger.debug(f"Screenshot {file_name} is nearly the same as {similar_file_name}, it is linked to it")
+        return
+    write_function(*args)
+    if store is not None:
+        store.add_similar(dhashes, file_name)
+
+
+def get_screenshot_writer():
+    if not hasattr(data_store.suite, "screenshot_writer") or data_store.suite.screenshot_writer is None:
+        data_store.suite.screenshot_writer = ScreenshotWriter(
+            max_workers=int(os.getenv("screenshot_writer_workers", "2")),
+            max_pending=int(os.getenv("screenshot_writer_queue_size", "8")),
+        )
+    return data_store.suite.screenshot_writer
+
+
+def drain_screenshot_writer():
     try:
-        if len(g_c_o_s(driver.get_screenshot_as_base64())) == 1:
-            return None
-        image = driver.get_screenshot_as_png()
-        image_file_path = os.path.join(os.getenv("gauge_screenshots_dir"), f"screenshot-{tc_id}-{uuid1().int}.png")
-        with open(image_file_path, "wb") as file:
-            file.write(image)
-        list_image.append(image_file_path)
+        if hasattr(data_store.suite, "screenshot_writer") and data_store.suite.screenshot_writer is not None:
+            data_store.suite.screenshot_writer.drain()
     except Exception as exception:
         logger.error(exception)
 
 
+def write_element_screenshot(file_name, image):
+    pil_format, _ = get_screenshot_format()
+    max_edge = int(os.getenv("screenshot_max_edge", "0"))
+    with Image.open(BytesIO(image)) as element_image:
+        if pil_format == "PNG" and (max_edge <= 0 or max(element_image.size) <= max_edge):
+            # Already encoded as it should be, write the captured bytes as they are
+            with open(file_name, "wb") as file:
+                file.write(image)
+            logger.debug(f"Your element screenshot has been saved at: {file_name} ({len(image):,} bytes)")
+        else:
+            save_screenshot_image(element_image, file_name)
+
+
+def write_composite_screenshot(file_name, list_image):
+    """Decode the captures, drop the blank ones and write them side by side with the same height"""
+    images = []
+    for item in list_image:
+        image = Image.open(BytesIO(item)) if isinstance(item, bytes) else item
+        if is_blank_image(image):
+            image.close()
+        else:
+            images.append(image)
+
+    if images:
+        max_height = max(im.size[1] for im in images)
+        resized_images = [im if im.size[1] == max_height else im.resize((int(im.size[0] * max_height / im.size[1]), max_height)) for im in images]
+        total_width = sum(im.size[0] for im in resized_images)
+        new_im = Image.new("RGB", (total_width, max_height), (256, 256, 256))
+        x_offset = 0
+        for im in resized_images:
+            new_im.paste(im, (x_offset, 0))
+            x_offset += im.size[0]
+        for im in images + resized_images:
+            im.close()
+        save_screenshot_image(new_im, file_name)
+    else:
+        new_im = Image.new("RGB", (1, 1), (256, 256, 256))
+        new_im.save(file_name, format=get_screenshot_format()[0])
+    new_im.close()
+
+
+def get_screenshot_format():
+    """
+    Return the (PIL format, file extension) of the screenshot_format setting: png | jpeg | webp
+    Unknown values fall back to png.
+    """
+    screenshot_format = os.getenv("screenshot_format", "png").strip().lower()
+    return SCREENSHOT_FORMATS.get(screenshot_format, SCREENSHOT_FORMATS["png"])
+
+
+def save_screenshot_image(image: Image.Image, file_name):
+    """Downscale the image to screenshot_max_edge (if set), encode it in screenshot_format and write it"""
+    pil_format, _ = get_screenshot_format()
+    max_edge = int(os.getenv("screenshot_max_edge", "0"))
+    quality = int(os.getenv("screenshot_quality", "85"))
+
+    start = time.time()
+    if max_edge > 0 and max(image.size) > max_edge:
+        image = image.copy()
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    if pil_format == "PNG":
+        image.save(buffer, format=pil_format, compress_level=6)
+    else:
+        image.save(buffer, format=pil_format, quality=quality)
+    encode_time = time.time() - start
+
+    with open(file_name, "wb") as file:
+        file.write(buffer.getbuffer())
+    logger.debug(f"Your screenshot has been saved at: {file_name} ({image.size[0]}x{image.size[1]} {pil_format}, {buffer.tell():,} bytes, encoded in {encode_time:,.3f} seconds)")
+
+
+def capture_all_screenshots(timeout_in_seconds=5):
+    """
+    Capture every live driver at the same time, one daemon thread per driver, and return the raw PNG captures.
+    A driver which does not answer within the timeout gets a placeholder tile instead of stalling the failure path,
+    its hung thread is left behind and does not keep the process alive.
+    """
+    list_image = []
+    drivers = [(slot, data_store.suite[slot]) for slot in ["web", "web2", "web3", "mobile"] if hasattr(data_store.suite, slot) and data_store.suite[slot] is not None]
+    captures = {}
+
+    def capture(slot, driver):
+        captures[slot] = get_screenshot_bytes(driver)
+
+    threads = []
+    for slot, driver in drivers:
+        thread = threading.Thread(target=capture, args=(slot, driver), name=f"screenshot-{slot}", daemon=True)
+        thread.start()
+        threads.append((slot, thread))
+    deadline = time.time() + timeout_in_seconds
+    for slot, thread in threads:
+        thread.join(max(deadline - time.time(), 0))
+        if thread.is_alive():
+            logger.warning(f"Screenshot of {slot} driver is not captured after {timeout_in_seconds} seconds !!!")
+            list_image.append(get_placeholder_image(f"{slot}: screenshot timed out after {timeout_in_seconds} seconds"))
+        elif captures.get(slot) is not None:
+            list_image.append(captures[slot])
+    return list_image
+
+
+def get_screenshot_bytes(driver: WebDriver):
+    try:
+        return driver.get_screenshot_as_png()
+    except Exception as exception:
+        logger.error(exception)
+        return None
+
+
+def get_placeholder_image(text, size=(640, 360)):
+    image = Image.new("RGB", size, (64, 64, 64))
+    ImageDraw.Draw(image).text((20, size[1] // 2), text, fill=(255, 255, 255))
+    return image
+
+
+def is_blank_image(image: Image.Image, max_edge=128):
+    """A screenshot is blank if its downsampled (box filtered) version has no variance on any band"""
+    try:
+        factor = max(1, -(-max(image.size) // max_edge))
+        with image.convert("RGB").reduce(factor) as small_image:
+            return max(ImageStat.Stat(small_image).var) == 0
+    except Exception as exception:
+        logger.error(exception)
+        return False
+
+
 def init_spec_data(context):
     try:
         tc_id = unicodedata.normalize("NFKD", context.specification.name.strip().replace(" ", "_")).encode("ASCII", "ignore").decode()
@@ -283,7 +476,7 @@ def init_spec_data(context):
         for character in pattern:
             tc_id = tc_id.replace(character, "")
         data_store.spec.test_case_id = tc_id
-        data_store.spec.archived_headers = []
+        data_store.spec.archived_headers = HeaderArchive(max_values=int(os.getenv("header_archive_size", "1000")))
         with open(context.specification.file_name, encoding="utf-8") as data:
             for line in data:
                 if line.startswith("$"):
@@ -299,43 +492,140 @@ def init_step_driver(context):
         test_type = init_step_testing_type(context)
         if test_type is not None:
             test_type = test_type.lower().strip()
-            if "WebPage".lower() == test_type and (not hasattr(data_store.suite, "web") or data_store.suite["web"] is None):
-                data_store.suite["web"] = init_chrome_driver(
-                    download_folder=os.path.join(
-                        "web",
-                        str(uuid.uuid4()),
-                    )
-                )
-                WebPage.init(data_store.suite["web"])
-            if "WebPage2".lower() == test_type and (not hasattr(data_store.suite, "web2") or data_store.suite["web2"] is None):
-                data_store.suite["web2"] = init_chrome_driver(
-                    download_folder=os.path.join(
-                        "web2",
-                        str(uuid.uuid4()),
-                    )
-                )
-                WebPage2.init(data_store.suite["web2"])
-            if "WebPage3".lower() == test_type and (not hasattr(data_store.suite, "web3") or data_store.suite["web3"] is None):
-                data_store.suite["web3"] = init_chrome_driver(
-                    download_folder=os.path.join(
-                        "web3",
-                        str(uuid.uuid4()),
-                    )
-                )
-                WebPage3.init(data_store.suite["web3"])
-            if "MobileScreen".lower() == test_type and (not hasattr(data_store.suite, "mobile") or data_store.suite["mobile"] is None):
-                data_store.suite["mobile"] = init_mobile_driver()
-                if data_store.suite["mobile"] is not None:
-                    MobileScreen.init(data_store.suite["mobile"])
-                else:
-                    logger.warning("Mobile driver cannot be created, please check it again !!!")
-                    data_store.suite.able_to_run = False
+            if test_type in DRIVER_SLOTS:
+                init_slot_driver(test_type)
         return "API" if test_type is None else test_type.upper().replace("SCREEN", "").replace("PAGE", " ").strip()
     except Exception as exception:
         logger.error(exception)
 
 
+def init_slot_driver(test_type):
+    """Attach the driver of a testing type to its page class, waiting for its warm-up if it has been started"""
+    slot, page_class = DRIVER_SLOTS[test_type]
+    if hasattr(data_store.suite, slot) and data_store.suite[slot] is not None:
+        return data_store.suite[slot]
+    future = data_store.suite.setdefault("driver_futures", {}).pop(slot, None)
+    data_store.suite[slot] = claim_warm_up_driver(future) if future is not None else create_slot_driver(test_type)
+    if data_store.suite[slot] is not None:
+        page_class.init(data_store.suite[slot])
+        if slot != "mobile":
+            init_network_capture(data_store.suite[slot])
+            init_event_subscription(data_store.suite[slot])
+    elif slot == "mobile":
+        logger.warning("Mobile driver cannot be created, please check it again !!!")
+        data_store.suite.able_to_run = False
+    return data_store.suite[slot]
+
+
+def init_network_capture(driver):
+    """Capture the network events of a spec which sets $network_capture = True (or of all specs with the network_capture setting)"""
+    try:
+        if data_store.spec.get("network_capture", os.getenv("network_capture", "false").lower() == "true"):
+            start_network_capture(driver, data_store.spec.get("network_capture_url_pattern"))
+        elif is_network_capture_on(driver):
+            stop_network_capture(driver)
+    except Exception as exception:
+        logger.error(exception)
+
+
+def init_event_subscription(driver):
+    """Subscribe to the console, network and navigation events of a web driver once, with the bidi_events setting"""
+    try:
+        if os.getenv("bidi_events", "false").lower() == "true":
+            subscribe_events(driver)
+    except Exception as exception:
+        logger.error(exception)
+
+
+def create_slot_driver(test_type):
+    try:
+        slot = DRIVER_SLOTS[test_type][0]
+        if slot == "mobile":
+            return init_mobile_driver()
+        download_folder = os.path.join(slot, str(uuid.uuid4()))
+        if data_store.suite.get("chrome_session_pool") is not None:
+            driver = data_store.suite.chrome_session_pool.acquire(slot)
+            if driver is None:
+                driver = init_chrome_driver(download_folder=download_folder)
+                # A pooled session empties its download directory on reset, so it must not share it with another session
+                if driver is not None:
+                    BrowserUtil.set_download_directory(driver, os.path.join(PROJECT_PATH, "download", download_folder))
+            return driver
+        return init_chrome_driver(download_folder=download_folder)
+    except Exception as exception:
+        logger.error(exception)
+        return None
+
+
+def init_spec_driver_warm_up(context):
+    """
+    Start every driver the spec needs at the same time on the warm-up pool.
+    If the spec configures its drivers with steps (ChromeOpts, MobileCapabilities), the warm-up waits for these steps to be done.
+    """
+    try:
+        data_store.spec.pending_warm_up = []
+        data_store.spec.pending_configuration_steps = 0
+        if is_table_driven_spec(context.specification.file_name):
+            # The steps (and the drivers they configure) of each row are only known when the row runs, drivers are created by the steps
+            logger.debug("The spec is driven by a data table, its drivers are not warmed up")
+            return None
+        entries = get_spec_step_entries(context)
+        data_store.spec.pending_warm_up = list(dict.fromkeys(entry.testing_type.lower() for entry in entries if entry.testing_type is not None))
+        data_store.spec.pending_configuration_steps = len([entry for entry in entries if entry.configures_driver])
+        if data_store.spec.pending_configuration_steps == 0:
+            start_driver_warm_up(data_store.spec.pending_warm_up)
+    except Exception as exception:
+        logger.error(exception)
+
+
+def resume_spec_driver_warm_up(context):
+    try:
+        if not data_store.spec.get("pending_configuration_steps"):
+            return None
+        entry = find_step_entry(context.step.text)
+        if entry is not None and entry.configures_driver:
+            data_store.spec.pending_configuration_steps -= 1
+            if data_store.spec.pending_configuration_steps == 0:
+                start_driver_warm_up(data_store.spec.pending_warm_up)
+    except Exception as exception:
+        logger.error(exception)
+
+
+def start_driver_warm_up(testing_types):
+    futures = data_store.suite.setdefault("driver_futures", {})
+    for test_type in testing_types:
+        if test_type not in DRIVER_SLOTS:
+            continue
+        slot = DRIVER_SLOTS[test_type][0]
+        if slot in futures or (hasattr(data_store.suite, slot) and data_store.suite[slot] is not None):
+            continue
+        logger.debug(f"Warming up {slot} driver ... !!!")
+        futures[slot] = DRIVER_WARM_UP_POOL.submit(collect_messages, create_slot_driver, test_type)
+
+
+def claim_warm_up_driver(future):
+    """The driver of a warm-up, its messages are written now by the thread which claims it"""
+    driver, messages = future.result()
+    for message in messages:
+        Messages.write_message(message)
+    return driver
+
+
+def collect_warm_up_drivers():
+    """Wait for the warm-up drivers which have not been used by any step so that they can be cleaned up"""
+    futures = data_store.suite.setdefault("driver_futures", {})
+    for slot in list(futures):
+        try:
+            driver = claim_warm_up_driver(futures.pop(slot))
+            if driver is not None and (not hasattr(data_store.suite, slot) or data_store.suite[slot] is None):
+                data_store.suite[slot] = driver
+                next(page_class for s, page_class in DRIVER_SLOTS.values() if s == slot).init(driver)
+        except Exception as exception:
+            logger.error(exception)
+
+
 def clean_up_all_web_drivers():
+    collect_warm_up_drivers()
     try:
         if hasattr(data_store.suite, "web") and data_store.suite["web"] is not None:
             data_store.suite["web"].quit()
@@ -360,8 +650,30 @@ def clean_up_all_web_drivers():
     ChromeOpts()
 
 
+def release_all_web_drivers():
+    collect_warm_up_drivers()
+    for slot in ["web", "web2", "web3"]:
+        try:
+            if hasattr(data_store.suite, slot) and data_store.suite[slot] is not None:
+                data_store.suite.chrome_session_pool.release(slot, data_store.suite[slot])
+                data_store.suite[slot] = None
+        except Exception as exception:
+            logger.error(exception)
+    # Reset Chrome Options
+    ChromeOpts()
+
+
+def clean_up_chrome_session_pool():
+    try:
+        if data_store.suite.get("chrome_session_pool") is not None:
+            data_store.suite.chrome_session_pool.close()
+    except Exception as exception:
+        logger.error(exception)
+
+
 def clean_up_mobile_driver():
     # ============================== MOBILE ==============================
+    collect_warm_up_drivers()
     try:
         if hasattr(data_store.suite, "mobile") and data_store.suite["mobile"] is not None:
             mobile_driver = data_store.suite["mobile"]
@@ -401,114 +713,113 @@ def config_report_settings():
         logger.error(exception)
 
 
-def init_spec_testing_type(context):
+def init_step_index():
     try:
-        testing_types = []
-        with open(context.specification.file_name, "r", encoding="utf-8") as data:
-            for line in data:
-                if line.strip().startswith("*"):
-                    cswa = convert_step_with_arg(line)
-                    file_path, line_number = find_file_related_to_step(cswa)
-                    test_type = get_testing_type_in_file(file_path, line_number)
-                    if test_type is not None:
-                        testing_types.append(test_type)
-        return list(dict.fromkeys(testing_types))
+        start = time.time()
+        resolver = PageClassResolver(cache_file=os.path.join(CACHE_PATH, "page_classes.json"))
+        data_store.suite.step_index = StepIndex(get_step_impl_dirs(PROJECT_PATH), resolver)
+        data_store.suite.concept_index = ConceptIndex(get_spec_dirs(PROJECT_PATH))
+        logger.debug(f"Indexed {len(data_store.suite.step_index)} steps and {len(data_store.suite.concept_index)} concepts in {time.time() - start:.3f} seconds")
     except Exception as exception:
         logger.error(exception)
-        return list(dict.fromkeys(testing_types))
 
 
-def init_step_testing_type(context):
+def refresh_step_index():
     try:
-        cswa = convert_step_with_arg(context.step.text)
-        file_path, line_number = find_file_related_to_step(cswa)
-        test_type = get_testing_type_in_file(file_path, line_number)
-        return test_type if test_type is not None else None
+        if not hasattr(data_store.suite, "step_index") or data_store.suite.step_index is None:
+            init_step_index()
+        else:
+            data_store.suite.step_index.refresh()
+            data_store.suite.concept_index.refresh()
+    except Exception as exception:
+        logger.error(exception)
+
+
+def find_step_entry(step: str):
+    try:
+        if not hasattr(data_store.suite, "step_index") or data_store.suite.step_index is None:
+            init_step_index()
+        return data_store.suite.step_index.lookup(step)
     except Exception as exception:
         logger.error(exception)
         return None
 
 
-def convert_step_with_arg(step: str):
+def get_spec_step_entries(context):
+    """The StepEntry of every step the spec runs, the steps of its concepts included"""
     try:
-        st = step.strip()
-        result = re.findall('"(.+?)"', st)
-        for item in result:
-            st = st.replace(f'"{item}"', "arg")
-        result = re.findall("<(.+?)>", st)
-        for item in result:
-            st = st.replace(f"<{item}>", "arg")
-        return st
+        entries = []
+        with open(context.specification.file_name, "r", encoding="utf-8") as data:
+            for line in data:
+                if line.strip().startswith("*"):
+                    for step in expand_concept_step(line.strip()[1:]):
+                        entry = find_step_entry(step)
+                        if entry is not None:
+                            entries.append(entry)
+        return entries
     except Exception as exception:
         logger.error(exception)
+        return entries
 
 
-def find_file_related_to_step(step_with_arg: str):
+def expand_concept_step(step: str):
     try:
-        file_path = None
-        line_number = None
-        for path, subdirs, files in os.walk(PROJECT_PATH):
-            for name in files:
-                if name[-3:] == ".py":
-                    file_path = os.path.join(path, name)
-                    with open(file_path, "r", encoding="utf-8") as data:
-                        line_number = 0
-                        for line in data:
-                            line_number = line_number + 1
-                            sf = line.strip()
-                            # if sf.startswith('@step'):
-                            result = re.findall("<(.+?)>", sf)
-                            if result:
-                                for item in result:
-                                    sf = sf.replace(f"<{item}>", "arg")
-                            if step_with_arg in sf:
-                                return file_path, line_number
+        if not hasattr(data_store.suite, "concept_index") or data_store.suite.concept_index is None:
+            init_step_index()
+        return data_store.suite.concept_index.expand(step)
     except Exception as exception:
         logger.error(exception)
+        return [step]
 
 
-def get_testing_type_in_file(file_path, line_number):
+def is_table_driven_spec(file_name):
+    """A spec with a data table (inline before its first scenario or table:<file>) or with steps taking <column> parameters"""
     try:
-        count = 0
-        test_type = None
-        with open(file_path, "r", encoding="utf-8") as data:
+        in_scenario = False
+        in_step = False
+        with open(file_name, "r", encoding="utf-8") as data:
             for line in data:
-                if count > line_number:
-                    break
-                result = re.findall(r"class (.+?)\):", line)
-                if result:
-                    test_type = re.search(r"\((.*)\)", line)
-                    test_type = test_type[1]
-                count = count + 1
-        return test_type
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("*"):
+                    in_step = True
+                    if re.search(r"<(?!file:|table:)[^<>]+>", line):
+                        return True
+                elif line.startswith("|"):
+                    # A table right after a step is its argument, before the first scenario it is the data table of the spec
+                    if not in_step and not in_scenario:
+                        return True
+                else:
+                    in_step = False
+                    if line.startswith("##") or line.startswith("---"):
+                        in_scenario = True
+                    elif not in_scenario and line.lower().startswith("table:"):
+                        return True
+        return False
     except Exception as exception:
         logger.error(exception)
+        return True
 
 
-def g_c_o_s(screenshot_as_base64):
+def init_spec_testing_type(context):
     try:
-        result = []
-        img = Image.open(BytesIO(base64.b64decode(screenshot_as_base64)))
-        pixel_count = img._size[0] * img._size[1]
-        list_color = img.getcolors(256**2 * 256)
-        list_color.sort(reverse=True)
-        for color in list_color:
-            color_red = hex(color[1][0]).replace("0x", "0")[-2:].upper()
-            color_green = hex(color[1][1]).replace("0x", "0")[-2:].upper()
-            color_blue = hex(color[1][2]).replace("0x", "0")[-2:].upper()
-            obj = (
-                round(color[0] * 100 / pixel_count, 3),
-                f"#{color_red}{color_green}{color_blue}",
-                color_names.find(f"#{color_red}{color_green}{color_blue}"),
-            )
-            result.append(obj)
-        img.close()
-        return result[:10]
+        testing_types = [entry.testing_type for entry in get_spec_step_entries(context) if entry.testing_type is not None]
+        return list(dict.fromkeys(testing_types))
     except Exception as exception:
         logger.error(exception)
         return []
 
 
+def init_step_testing_type(context):
+    try:
+        entry = find_step_entry(context.step.text)
+        return None if entry is None else entry.testing_type
+    except Exception as exception:
+        logger.error(exception)
+        return None
+
+
 def get_latest_log_file():
     try:
         file_list = []
@@ -1,70 +1,367 @@
+import http.client
 import json
-from dataclasses import dataclass
+import os
+import ssl
+import threading
+import time
+from dataclasses import InitVar, dataclass, field
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
 
+import gevent.pool
 import requests
 from genson import SchemaBuilder
-from jsonschema import validate
+from geventhttpclient import HTTPClient
+from geventhttpclient.url import URL
 from requests import Response as Rs
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
 
 from . import logger
+from .latency_util import assert_latency, record_latency
+from .schema_util import validate_json
+
+# One HTTPAdapter (urllib3 connection pool, thread safe) per base url, shared by the Sessions of all threads
+_adapters = {}
+_adapters_lock = threading.Lock()
+# A requests.Session is not thread safe, each thread has its own Session per base url on top of the shared adapters
+_sessions = threading.local()
+_all_sessions = []
+
+
+def get_base_url(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_adapter(base_url):
+    """
+    The HTTPAdapter of a base url, created on first use with the api_pool_size, api_retries and api_retry_backoff settings.
+    Connect errors (the request is not sent) are retried for every method,
+    502/503/504 responses only for GET, HEAD and OPTIONS: PUT, POST and DELETE may have been applied by the server.
+    """
+    with _adapters_lock:
+        adapter = _adapters.get(base_url)
+        if adapter is None:
+            pool_size = int(os.getenv("api_pool_size", "10"))
+            retry = Retry(
+                total=int(os.getenv("api_retries", "2")),
+                backoff_factor=float(os.getenv("api_retry_backoff", "0.3")),
+                status_forcelist=[502, 503, 504],
+                allowed_methods=["GET", "HEAD", "OPTIONS"],
+                raise_on_status=False,
+            )
+            adapter = _adapters[base_url] = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        return adapter
+
+
+def get_session(url):
+    """
+    The keep-alive Session of the current thread for the base url of url.
+    Its cookie jar rejects every cookie: like requests.get/post, a request only sends the cookies it is given.
+    """
+    base_url = get_base_url(url)
+    sessions = _sessions.__dict__.setdefault("sessions", {})
+    session = sessions.get(base_url)
+    if session is None:
+        session = sessions[base_url] = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.mount(f"{base_url}/", get_adapter(base_url))
+        with _adapters_lock:
+            _all_sessions.append(session)
+    return session
+
+
+def get_batch_request(request):
+    """A request of APIRequest.batch as {"method", "url", "payload", "json", "headers", "params"}"""
+    if isinstance(request, dict):
+        return {"method": "GET", **request}
+    return dict(zip(["method", "url", "payload", "headers"], request))
+
+
+def decode_body(content: bytes, headers):
+    charset = requests.utils.get_encoding_from_headers(headers) or "utf-8"
+    try:
+        return content.decode(charset, errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
+
+
+def close_sessions():
+    """Close the Sessions of all threads and the pooled connections of all base urls"""
+    with _adapters_lock:
+        for session in _all_sessions:
+            session.close()
+        _all_sessions.clear()
+        for adapter in _adapters.values():
+            adapter.close()
+        _adapters.clear()
+    _sessions.__dict__.pop("sessions", None)
+
+
+def get_batch_client(clients, url, concurrency, timeout, verify=None, proxies=None):
+    """
+    The gevent HTTPClient of APIRequest.batch for the base url of url, created on first use
+    with verify and proxies merged with the environment like requests does (REQUESTS_CA_BUNDLE, HTTPS_PROXY, NO_PROXY...)
+    """
+    base_url = get_base_url(url)
+    if base_url not in clients:
+        settings = get_session(url).merge_environment_settings(url, proxies or {}, None, verify, None)
+        options = {"concurrency": concurrency, "connection_timeout": timeout, "network_timeout": timeout}
+        if settings["verify"] is False:
+            options.update({"insecure": True, "ssl_context_factory": create_unverified_context})
+        elif isinstance(settings["verify"], str):
+            options["ssl_options"] = {"ca_certs": settings["verify"]}
+        proxy = requests.utils.select_proxy(url, settings["proxies"])
+        if proxy:
+            proxy_url = URL(proxy if "://" in proxy else f"http://{proxy}")
+            options.update({"proxy_host": proxy_url.host, "proxy_port": proxy_url.port})
+        clients[base_url] = HTTPClient.from_url(URL(url), **options)
+    return clients[base_url]
+
+
+def create_unverified_context(cafile=None):
+    context = ssl.create_default_context(cafile=cafile)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+MAX_REDIRECTS = requests.models.DEFAULT_REDIRECT_LIMIT
+REDIRECT_CODES = [301, 302, 303, 307, 308]
+
+_UNSET = object()
 
 
 @dataclass
 class Response:
+    """
+    The response of an APIRequest. text, json and schema are computed on first access only, then kept:
+    json is {} if the body is not JSON, schema is the JSON schema inferred from json (genson).
+    A downloaded response keeps its body in file_path, text reads it back on access.
+    """
+
     status_code: int
-    text: str
-    json: object
-    headers: dict
-    schema: dict
+    text: str = field(default=_UNSET, repr=False)
+    json: object = field(default=_UNSET, repr=False)
+    headers: dict = None
+    schema: dict = field(default=_UNSET, repr=False)
+    elapsed: float = None
+    error: str = None
+    file_path: str = None
+    raw: InitVar[Rs] = None
 
+    def __post_init__(self, raw):
+        if self.headers is None:
+            self.headers = {}
+        self._raw = raw
 
-class APIRequest:
-    def __get_responses(self, response: Rs):
+    def _get_text(self):
+        if self._raw is not None:
+            return self._raw.text
+        if self.file_path is not None:
+            with open(self.file_path, encoding=requests.utils.get_encoding_from_headers(self.headers) or "utf-8", errors="replace") as file:
+                return file.read()
+        return ""
+
+    def _get_json(self):
         try:
-            headers = response.headers
-            status_code = response.status_code
-            text = response.text
-            json = response.json()
+            if self._raw is not None:
+                return self._raw.json()
+            return requests.models.complexjson.loads(self.text)
         except Exception:
-            json = {}
+            return {}
+
+    def _get_schema(self):
         try:
             builder = SchemaBuilder()
-            builder.add_object(json)
-            schema = builder.to_schema()
+            builder.add_object(self.json)
+            return builder.to_schema()
         except Exception:
-            schema = {}
-        return Response(status_code, text, json, headers, schema)
+            return {}
+
+
+def _lazy_field(name, compute):
+    """A dataclass field computed by compute on first read unless a value is given, then kept in the instance"""
+    key = f"_{name}"
+
+    def get(self):
+        value = self.__dict__.get(key, _UNSET)
+        if value is _UNSET:
+            value = self.__dict__[key] = compute(self)
+        return value
+
+    def set(self, value):
+        self.__dict__[key] = value
+
+    return property(get, set)
+
+
+# After @dataclass, so that __init__, __eq__ and asdict see plain fields which are read through the properties
+Response.text = _lazy_field("text", Response._get_text)
+Response.json = _lazy_field("json", Response._get_json)
+Response.schema = _lazy_field("schema", Response._get_schema)
+
+
+class APIRequest:
+    def __get_responses(self, response: Rs, method, url):
+        # Keyed by the requested method and url as batch does, not by the last request of the redirects
+        record_latency(method, url, response.elapsed.total_seconds())
+        return Response(response.status_code, headers=response.headers, elapsed=response.elapsed.total_seconds(), raw=response)
 
     def get(self, url, **kwargs):
         try:
-            response = requests.get(url, **kwargs, timeout=60)
-            return self.__get_responses(response)
+            response = get_session(url).get(url, **kwargs, timeout=60)
+            return self.__get_responses(response, "GET", url)
         except Exception as exc:
             logger.error(exc)
 
     def post(self, url, payload, headers, **kwargs):
         try:
-            response = requests.post(url, data=payload, headers=headers, **kwargs, timeout=60)
-            return self.__get_responses(response)
+            response = get_session(url).post(url, data=payload, headers=headers, **kwargs, timeout=60)
+            return self.__get_responses(response, "POST", url)
         except Exception as exc:
             logger.error(exc)
 
     def put(self, url, payload, headers, **kwargs):
         try:
-            response = requests.put(url, data=payload, headers=headers, **kwargs, timeout=60)
-            return self.__get_responses(response)
+            response = get_session(url).put(url, data=payload, headers=headers, **kwargs, timeout=60)
+            return self.__get_responses(response, "PUT", url)
         except Exception as exc:
             logger.error(exc)
 
     def delete(self, url, **kwargs):
         try:
-            response = requests.delete(url, **kwargs, timeout=60)
-            return self.__get_responses(response)
+            response = get_session(url).delete(url, **kwargs, timeout=60)
+            return self.__get_responses(response, "DELETE", url)
         except Exception as exc:
             logger.error(exc)
 
+    def download(self, url, file_path, chunk_size=1024 * 1024, **kwargs):
+        """
+        Stream the body of a GET to file_path chunk by chunk, without loading it into memory
+        Returns:
+            Response: with file_path, its text / json are read from the file on access only
+        """
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+            with get_session(url).get(url, **kwargs, stream=True, timeout=60) as response:
+                with open(file_path, "wb") as file:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        file.write(chunk)
+            record_latency("GET", url, response.elapsed.total_seconds())
+            return Response(response.status_code, headers=response.headers, elapsed=response.elapsed.total_seconds(), file_path=file_path)
+        except Exception as exc:
+            logger.error(exc)
+
+    def batch(self, requests_list: list, concurrency: int = None, timeout=60, verify=None, proxies: dict = None, cookies=None):
+        """
+        Send several requests at once on gevent sockets (no monkey patching, the synchronous methods are not affected)
+        Args:
+            requests_list (list): [{"method": "GET", "url": url, "payload": str | bytes | dict, "json": object, "headers": dict, "params": dict, "cookies": dict}]
+                or tuples (method, url, payload, headers), only method and url are required.
+                payload is sent like data= of post/put (a dict is form encoded), json is sent as JSON.
+            concurrency (int, optional): [Requests in flight]. Defaults to the api_batch_concurrency setting.
+            verify, proxies, cookies (optional): [As for get/post] for all requests, with the proxies and CA bundle of the environment.
+                A proxy is tunnelled with CONNECT, without proxy credentials.
+        Returns:
+            list: Response of each request in order, a failed request has status_code None and error set.
+            Redirects are followed like requests does (cookies set on the way are sent to the next hops),
+            elapsed is the time until the headers of the last response (as requests).
+        """
+        try:
+            concurrency = concurrency or int(os.getenv("api_batch_concurrency", "10"))
+            clients = {}
+
+            def send(request):
+                start_time = time.time()
+                try:
+                    return self.__send_on_client(clients, request, concurrency, timeout, verify, proxies, request.get("cookies", cookies))
+                except Exception as exc:
+                    logger.debug(f"{request['method']} {request['url']}: {exc}")
+                    return Response(None, "", {}, {}, {}, time.time() - start_time, str(exc))
+
+            try:
+                batch_requests = [get_batch_request(request) for request in requests_list]
+                responses = gevent.pool.Pool(concurrency).map(send, batch_requests)
+                for request, response in zip(batch_requests, responses):
+                    if response.status_code is not None:
+                        record_latency(request["method"], request["url"], response.elapsed)
+                return responses
+            finally:
+                for client in clients.values():
+                    client.close()
+        except Exception as exc:
+            logger.error(exc)
+
+    def map(self, method, urls: list, payloads: list = None, headers=None, concurrency: int = None, timeout=60, verify=None, proxies: dict = None, cookies=None):
+        """
+        batch() of one method over urls, with the payload of the same index (if any) and the same headers
+        A payload is sent like data= of post/put (a dict is form encoded), redirects are followed, verify, proxies and cookies are as for batch().
+        e.g. api.map("GET", [f"{APP_ENDPOINT}users/{i}" for i in range(100)], concurrency=20)
+        """
+        payloads = payloads or [None] * len(urls)
+        return self.batch([{"method": method, "url": url, "payload": payload, "headers": headers} for url, payload in zip(urls, payloads)], concurrency, timeout, verify, proxies, cookies)
+
+    def __send_on_client(self, clients, request, concurrency, timeout, verify, proxies, cookies):
+        # requests encodes the body, params, headers and cookies, so a request is sent the same way as with post/put
+        jar = requests.cookies.merge_cookies(requests.cookies.RequestsCookieJar(), cookies or {})
+        prepared = requests.Request(
+            request["method"].upper(), request["url"], data=request.get("payload"), json=request.get("json"), headers=request.get("headers"), params=request.get("params"), cookies=jar
+        ).prepare()
+        for _ in range(MAX_REDIRECTS + 1):
+            client = get_batch_client(clients, prepared.url, concurrency, timeout, verify, proxies)
+            start_time = time.time()
+            response = client.request(prepared.method, URL(prepared.url).request_uri, body=prepared.body or b"", headers=dict(prepared.headers))
+            # The headers are read, the body is not: the same point as the elapsed of requests
+            elapsed = time.time() - start_time
+            try:
+                content = response.read()
+                header_items = response.items()
+            finally:
+                response.release()
+            response_headers = CaseInsensitiveDict()
+            message = http.client.HTTPMessage()
+            for name, value in header_items:
+                response_headers[name] = f"{response_headers[name]}, {value}" if name in response_headers else value
+                message[name] = value
+            jar.extract_cookies(requests.cookies.MockResponse(message), requests.cookies.MockRequest(prepared))
+            location = response_headers.get("Location")
+            if response.status_code not in REDIRECT_CODES or not location:
+                return Response(response.status_code, decode_body(content, response_headers), headers=response_headers, elapsed=elapsed)
+            # Same rules as requests.Session.resolve_redirects
+            next_request = prepared.copy()
+            next_request.url = requests.utils.requote_uri(requests.compat.urljoin(prepared.url, location))
+            if (response.status_code in [302, 303] and prepared.method != "HEAD") or (response.status_code == 301 and prepared.method == "POST"):
+                next_request.method = "GET"
+            if response.status_code not in [307, 308]:
+                next_request.body = None
+                for name in ["Content-Type", "Content-Length", "Transfer-Encoding"]:
+                    next_request.headers.pop(name, None)
+            if get_base_url(next_request.url) != get_base_url(prepared.url):
+                next_request.headers.pop("Authorization", None)
+            next_request.headers.pop("Cookie", None)
+            next_request.prepare_cookies(jar)
+            prepared = next_request
+        raise requests.TooManyRedirects(f"Exceeded {MAX_REDIRECTS} redirects")
+
+    def assert_latency(self, method, path, percent=95, max_ms=300, scope="spec"):
+        """
+        Assert that percent % of the requests of an endpoint took at most max_ms over this spec (or the suite)
+        path is a url (one host) or a templated path (all hosts), ids in the path are templated as {id}, {uuid}, {hex}, {token}
+        e.g. APIRequest().assert_latency("GET", "/users/{id}", 95, 300)
+        """
+        return assert_latency(method, path, percent, max_ms, scope)
+
     def validate_schema(self, json, schema):
+        """
+        Validate json against a schema (dict or name of a schema loaded from json_schema_dir) with a cached, compiled validator
+        Returns:
+            list: errors as [{"path", "message", "validator"}], empty if json is valid
+        """
         try:
-            validate(json, schema)
+            errors, _ = validate_json(json, schema)
+            return errors
         except Exception as exc:
             logger.error(exc)
@@ -3,6 +3,7 @@ import os
 import platform
 import random
 import sys
+import threading
 import time
 import traceback
 
@@ -51,6 +52,32 @@ def gauge_wrap(f):
     return wrap
 
 
+# Messages of a thread which collects them (see collect_messages) instead of writing them to the step which happens to run
+_collected_messages = threading.local()
+
+
+def write_message(message):
+    """Messages.write_message, or keep the message if the current thread collects its messages"""
+    messages = getattr(_collected_messages, "messages", None)
+    if messages is None:
+        Messages.write_message(message)
+    else:
+        messages.append(message)
+
+
+def collect_messages(f, *args, **kwargs):
+    """
+    Run f on a background thread with the messages of write_message kept aside, the gauge messages are global to the process
+    Returns:
+        tuple: (result of f, messages to write later from the step thread)
+    """
+    _collected_messages.messages = []
+    try:
+        return f(*args, **kwargs), _collected_messages.messages
+    finally:
+        _collected_messages.messages = None
+
+
 def get_parent_path(path):
     return os.path.abspath(os.path.join(path, os.pardir))
 
@@ -1,14 +1,18 @@
 import contextlib
 import datetime
+import json
 import os
 import platform
 import random
 import re
+import shutil
 import socket
+import threading
 
 # import subprocess
 import time
 from pathlib import Path
+from urllib.parse import urlsplit
 
 import psutil
 import toml
@@ -26,8 +30,9 @@ from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.webdriver import WebDriver
 from webdriver_manager.core.utils import read_version_from_cmd
 
-from . import gauge_wrap, logger, timing
+from . import gauge_wrap, logger, timing, write_message
 from .API_request import APIRequest
+from .network_util import stop_network_capture
 from .string_util import StringUtil
 
 
@@ -60,17 +65,22 @@ class BrowserUtil:
                 chrome_options = data_store.chrome_opts
             elif chrome_options is None:
                 chrome_options = get_default_chrome_options(download_directory)
+            options_fingerprint = get_chrome_options_fingerprint(chrome_options)
 
             if user_profile_dir is not None:
                 chrome_options.add_argument(f"user-data-dir={user_profile_dir}")
 
             chrome_options.page_load_strategy = "none"
             chrome_options.accept_insecure_certs = True
+            if os.getenv("bidi_events", "false").lower() == "true":
+                chrome_options.enable_bidi = True
             chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            # chromedriver would enable the Network domain of every new tab or window itself,
+            # it is only enabled by start_network_capture (see network_util)
             chrome_options.add_experimental_option(
                 "perfLoggingPrefs",
                 {
-                    "enableNetwork": True,
+                    "enableNetwork": False,
                     "enablePage": False,
                 },
             )
@@ -93,6 +103,10 @@ class BrowserUtil:
                         driver.__dict__.update({"download_directory": chrome_options._caps["goog:chromeOptions"]["prefs"]["download.default_directory"]})
                 except Exception as exception:
                     logger.warning(exception)
+                driver.__dict__.update({"options_fingerprint": options_fingerprint, "reuse_count": 0})
+                # Network events are captured on demand (see network_util.start_network_capture)
+                with contextlib.suppress(Exception):
+                    stop_network_capture(driver)
                 BrowserUtil.set_window_size_based_on_monitor_resolution(driver)
             return driver
         except Exception as exception:
@@ -122,7 +136,7 @@ class BrowserUtil:
             message = "Not enough devices for testing - Please check it again !!!"
             logger.warning(message)
             if data_store.suite.license:
-                Messages.write_message(message)
+                write_message(message)
             return None
 
         # if udid not in connected_devices:
@@ -180,7 +194,7 @@ class BrowserUtil:
                 message = "Not enough devices to run - Please check stuck devices if any ... !!!"
                 logger.warning(message)
                 if data_store.suite.license:
-                    Messages.write_message(message)
+                    write_message(message)
                 return None
         except Exception as exception:
             logger.error(exception)
@@ -212,7 +226,7 @@ class BrowserUtil:
                 message = f"Device {device_name} ({udid}) is under testing or stuck - Please check stuck devices if any ... !!!"
                 logger.warning(message)
                 if data_store.suite.license:
-                    Messages.write_message(message)
+                    write_message(message)
                 data_store.suite["repeat_creating_ios_driver"] = False
                 return None
 
@@ -227,7 +241,7 @@ class BrowserUtil:
                 message = f"Device {device_name} ({udid}) has not been booted ... !!!"
                 logger.warning(message)
                 if data_store.suite.license:
-                    Messages.write_message(message)
+                    write_message(message)
                 return None
 
         else:
@@ -337,10 +351,38 @@ class BrowserUtil:
 
     @staticmethod
     def reset_driver(driver: WebDriver):
+        """
+        Bring a browser session back to a clean state so that it can be reused by another spec:
+        a single fresh tab on about:blank, no cookies, no storage of the origins the browser knows of (see get_browser_origins),
+        no buffered performance logs and an empty download directory if the session has its own (see set_download_directory).
+        """
         try:
-            driver.delete_all_cookies()
+            origins = BrowserUtil.get_browser_origins(driver)
+            driver.switch_to.new_window("tab")
             BrowserUtil.close_all_redundant_tabs(driver)
-            driver.refresh()
+            for origin in origins:
+                with contextlib.suppress(Exception):
+                    driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            try:
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            except Exception:
+                driver.delete_all_cookies()
+            driver.get("about:blank")
+            with contextlib.suppress(Exception):
+                driver.get_log("performance")
+            with contextlib.suppress(Exception):
+                stop_network_capture(driver)
+            if "performance_log" in driver.__dict__:
+                driver.__dict__["performance_log"].reset()
+            download_directory = driver.__dict__.get("session_download_directory")
+            if download_directory and os.path.isdir(download_directory):
+                for item in os.listdir(download_directory):
+                    item_path = os.path.join(download_directory, item)
+                    if os.path.isdir(item_path):
+                        shutil.rmtree(item_path, ignore_errors=True)
+                    else:
+                        os.remove(item_path)
+            return True
         except Exception as exception:
             if exception.__dict__.get("msg"):
                 message = exception.__dict__.get("msg")
@@ -349,6 +391,77 @@ class BrowserUtil:
                     Messages.write_message(message)
             else:
                 logger.error(exception)
+            return False
+
+    @staticmethod
+    def get_browser_origins(driver: WebDriver):
+        """
+        The http(s) origins the browser has been on, asked to the browser itself: the navigation history and frames of every open tab
+        (redirects and links included), the service workers and the domains of the cookies.
+        Tabs closed before are not known anymore, the storage of an origin only seen in such a tab is not found.
+        """
+        origins = set()
+
+        def add(url):
+            parts = urlsplit(url or "")
+            if parts.scheme in ["http", "https"] and parts.netloc:
+                origins.add(f"{parts.scheme}://{parts.netloc}")
+
+        def add_frames(frame_tree):
+            add(frame_tree["frame"].get("url"))
+            for child in frame_tree.get("childFrames", []):
+                add_frames(child)
+
+        current_window = None
+        with contextlib.suppress(Exception):
+            current_window = driver.current_window_handle
+        for window_handle in driver.window_handles:
+            with contextlib.suppress(Exception):
+                driver.switch_to.window(window_handle)
+                for entry in driver.execute_cdp_cmd("Page.getNavigationHistory", {})["entries"]:
+                    add(entry.get("url"))
+                    add(entry.get("userTypedURL"))
+                add_frames(driver.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"])
+        with contextlib.suppress(Exception):
+            for target in driver.execute_cdp_cmd("Target.getTargets", {})["targetInfos"]:
+                add(target.get("url"))
+        with contextlib.suppress(Exception):
+            for cookie in driver.execute_cdp_cmd("Storage.getCookies", {})["cookies"]:
+                domain = cookie["domain"].lstrip(".")
+                origins.update([f"https://{domain}", f"http://{domain}"])
+        if current_window is not None:
+            with contextlib.suppress(Exception):
+                driver.switch_to.window(current_window)
+        return origins
+
+    @staticmethod
+    def set_download_directory(driver: WebDriver, download_directory: str):
+        """
+        Give a session its own download directory through CDP, whatever the download.default_directory of its options.
+        It is the only directory reset_driver empties.
+        """
+        try:
+            os.makedirs(download_directory, exist_ok=True)
+            driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "allow", "downloadPath": download_directory})
+            driver.__dict__.update({"download_directory": download_directory, "session_download_directory": download_directory})
+            return True
+        except Exception as exception:
+            logger.warning(exception)
+            return False
+
+    @staticmethod
+    def is_driver_healthy(driver: WebDriver):
+        try:
+            return len(driver.window_handles) > 0 and driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    @staticmethod
+    def quit_driver(driver: WebDriver):
+        try:
+            driver.quit()
+        except Exception as exception:
+            logger.warning(exception)
 
     @staticmethod
     def start_appium_service():
@@ -367,7 +480,7 @@ class BrowserUtil:
         except Exception as exception:
             logger.warning(exception)
             if data_store.suite.license:
-                Messages.write_message(exception)
+                write_message(exception)
             if hasattr(data_store.suite, "appium_service"):
                 data_store.suite.appium_service.stop()
 
@@ -446,6 +559,56 @@ class ChromeOpts:
         data_store.chrome_opts = self._chrome_options
 
 
+class ChromeSessionPool:
+    """
+    Keep the Chrome sessions of finished specs for the next specs instead of quitting them.
+    A session is reset when it is released and reused while it is healthy, has been created with the same options and has not reached max_reuse.
+    """
+
+    def __init__(self, max_reuse: int = 20):
+        self._max_reuse = max_reuse
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def acquire(self, slot: str, chrome_options=None):
+        """Return a healthy idle session of the slot created with the same options, None if there is not any"""
+        if hasattr(data_store, "chrome_opts"):
+            chrome_options = data_store.chrome_opts
+        elif chrome_options is None:
+            chrome_options = get_default_chrome_options()
+        fingerprint = get_chrome_options_fingerprint(chrome_options)
+        while fingerprint is not None:
+            with self._lock:
+                drivers = self._idle.get(slot, [])
+                driver = next((d for d in drivers if d.__dict__.get("options_fingerprint") == fingerprint), None)
+                if driver is None:
+                    return None
+                drivers.remove(driver)
+            if BrowserUtil.is_driver_healthy(driver):
+                driver.__dict__["reuse_count"] = driver.__dict__.get("reuse_count", 0) + 1
+                logger.debug(f"Reusing Chrome session of {slot} ({driver.__dict__['reuse_count']}/{self._max_reuse}) ... !!!")
+                return driver
+            logger.warning(f"Chrome session of {slot} is not healthy anymore, it will be recreated ... !!!")
+            BrowserUtil.quit_driver(driver)
+
+    def release(self, slot: str, driver: WebDriver):
+        """Reset the session and keep it for the next specs, or quit it if it is worn out or cannot be reset"""
+        if driver is None:
+            return None
+        if driver.__dict__.get("reuse_count", 0) >= self._max_reuse or not BrowserUtil.is_driver_healthy(driver) or not BrowserUtil.reset_driver(driver):
+            BrowserUtil.quit_driver(driver)
+            return None
+        with self._lock:
+            self._idle.setdefault(slot, []).append(driver)
+
+    def close(self):
+        with self._lock:
+            drivers = [driver for drivers in self._idle.values() for driver in drivers]
+            self._idle = {}
+        for driver in drivers:
+            BrowserUtil.quit_driver(driver)
+
+
 class MobileCapabilities:
     _capabilities: dict
 
@@ -520,6 +683,18 @@ def get_default_chrome_options(download_directory=os.path.join(PROJECT_PATH, "do
         return webdriver.ChromeOptions()
 
 
+def get_chrome_options_fingerprint(chrome_options=None):
+    """Identify the options a session has been created with, ignoring what create_chrome_driver adds itself and the download directory"""
+    try:
+        experimental_options = {key: value for key, value in chrome_options.experimental_options.items() if key not in ["prefs", "perfLoggingPrefs"]}
+        prefs = {key: value for key, value in chrome_options.experimental_options.get("prefs", {}).items() if key != "download.default_directory"}
+        arguments = [argument for argument in chrome_options.arguments if not argument.startswith("user-data-dir=")]
+        return json.dumps([chrome_options.binary_location, arguments, experimental_options, prefs], sort_keys=True, default=str)
+    except Exception as exception:
+        logger.warning(exception)
+        return None
+
+
 def get_free_port(host=LOCALHOST):
     try:
         # sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -4,9 +4,13 @@ Gives the name of any RGB color.
 If the exact color doesn't have a name, the closest match will be used instead.
 """
 
-__all__ = ["find"]
+__all__ = ["find", "find_many"]
 
 import functools
+import os
+import zlib
+
+import numpy as np
 
 
 @functools.singledispatch
@@ -4762,6 +4766,133 @@ _searchtree = {
     }
 }
 
+# ==================================================
+# Lookup table
+# ==================================================
+# find_many follows the same octree as find, vectorized over many colors, so both always give the same name.
+# The octree levels of the 5 high bits of each channel are the same for every color of a 32x32x32 cell: the table holds,
+# for each cell, where the walk ends after them: a name, a node whose descendants are searched for the nearest name
+# (like _approximate, ties go to the first descendant), or a node to walk on with the 3 low bits.
+# The table is built once, stored next to this module (keyed by a crc of the tree) and memory-mapped.
+
+_LUT_LEVELS = 32
+_LUT_SHIFT = 3
+_LUT_NAME, _LUT_APPROXIMATE, _LUT_WALK = 0, 1, 2
+
+_names = list(_colors)
+_names_array = np.array(_names, dtype=object)
+_palette = np.array([_colors[name] for name in _names], dtype=np.int64)
+
+
+def _flatten_tree():
+    """Octree as an (nodes, 8) array: child node id, -1 if missing, -2 - name index for a name"""
+    name_indexes = {name: index for index, name in enumerate(_names)}
+    nodes = [_searchtree]
+    children = []
+    descendants = []
+    position = 0
+    while position < len(nodes):
+        tree = nodes[position]
+        row = [-1] * 8
+        for i, child in tree.items():
+            if type(child) is str:
+                row[i] = -2 - name_indexes[child]
+            else:
+                row[i] = len(nodes)
+                nodes.append(child)
+        children.append(row)
+        descendants.append(np.array([name_indexes[name] for name in _descendants(tree)], dtype=np.int64))
+        position += 1
+    return np.array(children, dtype=np.int32), descendants
+
+
+def _build_lut():
+    lut = np.empty((_LUT_LEVELS**3, 2), dtype=np.int32)
+    for cell in range(_LUT_LEVELS**3):
+        r, g, b = (cell >> 10 & 31) << _LUT_SHIFT, (cell >> 5 & 31) << _LUT_SHIFT, (cell & 31) << _LUT_SHIFT
+        node = 0
+        for d in range(7, _LUT_SHIFT - 1, -1):
+            child = _tree_children[node, _octree_index(r, g, b, d)]
+            if child == -1:
+                lut[cell] = (_LUT_APPROXIMATE, node)
+                break
+            if child <= -2:
+                lut[cell] = (_LUT_NAME, -2 - child)
+                break
+            node = child
+        else:
+            lut[cell] = (_LUT_WALK, node)
+    return lut
+
+
+def _load_lut():
+    crc = zlib.crc32(repr((_names, _searchtree)).encode())
+    lut_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"color_names_octree{_LUT_LEVELS}_{crc:08x}.npy")
+    try:
+        if os.path.exists(lut_file):
+            lut = np.load(lut_file, mmap_mode="r")
+            if lut.shape == (_LUT_LEVELS**3, 2):
+                return lut
+    except Exception:
+        pass
+    lut = _build_lut()
+    try:
+        temp_file = f"{lut_file}.{os.getpid()}.tmp"
+        with open(temp_file, "wb") as data:
+            np.save(data, lut)
+        os.replace(temp_file, lut_file)
+    except Exception:
+        pass
+    return lut
+
+
+_tree_children, _tree_descendants = _flatten_tree()
+_lut = _load_lut()
+
+
+def find_many(colors):
+    """Finds the names of many colors at once, each name is the one find gives.
+
+    colors is an array-like of shape (..., 3) (or (..., 4), alpha is ignored) of ints in the range 0 <= x < 256,
+    e.g. a list of (r, g, b) tuples or the pixels of an image as np.asarray(image).
+    Returns an object array of names with the shape of colors without its last axis.
+    """
+    colors = np.asarray(colors)
+    if colors.ndim == 0 or colors.shape[-1] not in (3, 4):
+        raise ValueError("Malformed colors: the last axis must be of size 3 (r, g, b)")
+    if colors.size and (colors.min() < 0 or colors.max() > 255):
+        raise ValueError("Invalid color value: must be 0 <= x < 256")
+    rgb = colors[..., :3].astype(np.int64)
+    packed, inverse = np.unique((rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2], return_inverse=True)
+    r, g, b = packed >> 16, (packed >> 8) & 255, packed & 255
+    cells = ((r >> _LUT_SHIFT) * _LUT_LEVELS + (g >> _LUT_SHIFT)) * _LUT_LEVELS + (b >> _LUT_SHIFT)
+    kinds, values = np.asarray(_lut)[cells].T.astype(np.int64)
+    indexes = np.where(kinds == _LUT_NAME, values, -1)
+    # Walk on with the low bits, the colors which reach a name or a missing child stop walking
+    walking = np.flatnonzero(kinds == _LUT_WALK)
+    nodes = values[walking]
+    for d in range(_LUT_SHIFT - 1, -1, -1):
+        if not len(walking):
+            break
+        children = _tree_children[nodes, ((r[walking] >> d & 1) << 2) | ((g[walking] >> d & 1) << 1) | (b[walking] >> d & 1)]
+        named = children <= -2
+        indexes[walking[named]] = -2 - children[named]
+        missing = children == -1
+        kinds[walking[missing]] = _LUT_APPROXIMATE
+        values[walking[missing]] = nodes[missing]
+        walking, nodes = walking[children >= 0], children[children >= 0]
+    # Nearest descendant of the node where the walk stopped, grouped by node
+    approximate = np.flatnonzero(indexes == -1)
+    for node in np.unique(values[approximate]):
+        candidates = _tree_descendants[node]
+        group = approximate[values[approximate] == node]
+        for start in range(0, len(group), 4096):
+            chunk = group[start:start + 4096]
+            distances = ((_palette[candidates][None, :, :] - np.stack([r[chunk], g[chunk], b[chunk]], axis=-1)[:, None, :]) ** 2).sum(axis=-1)
+            indexes[chunk] = candidates[distances.argmin(axis=1)]
+    return _names_array[indexes][inverse.reshape(colors.shape[:-1])]
+
+
 if __name__ == "__main__":
     exact = [("Amaranth", (229, 43, 80)), ("Bamboo", (218, 99, 4)), ("Camelot", (137, 52, 86)), ("Denim", (21, 96, 189)), ("Elephant", (18, 52, 71))]
     approximate = [("Black", (1, 3, 2)), ("White", (254, 255, 255))]
@@ -0,0 +1,174 @@
+import cv2
+import numpy as np
+from assertpy import assert_that
+from PIL import Image
+
+from . import color_names
+
+
+def get_top_colors(image: Image.Image, number_of_colors=20):
+    """
+    Count the colors of an image and return the most used ones (alpha is ignored)
+    Returns:
+        tuple: (packed 0xRRGGBB colors, pixel counts, pixel count of the image), most used first
+    """
+    pixels = np.asarray(image.convert("RGB") if image.mode != "RGB" else image, dtype=np.uint32).reshape(-1, 3)
+    packed = (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+    colors, counts = np.unique(packed, return_counts=True)
+    # Most used first, the brightest (highest 0xRRGGBB) first among colors with the same count, as sorting (count, color) does.
+    # The composite key is unique, so the partial selection picks the same colors as a full sort
+    keys = (counts.astype(np.int64) << 24) | colors.astype(np.int64)
+    number_of_colors = max(number_of_colors, 0)
+    if number_of_colors < len(keys):
+        keys = keys[np.argpartition(-keys, number_of_colors - 1)[:number_of_colors]] if number_of_colors else keys[:0]
+    keys = np.sort(keys)[::-1]
+    return (keys & 0xFFFFFF).astype(np.uint32), keys >> 24, len(packed)
+
+
+def get_color_names_of_colors(colors):
+    """Names of packed 0xRRGGBB colors"""
+    rgb = np.stack([colors >> 16, (colors >> 8) & 255, colors & 255], axis=-1)
+    return color_names.find_many(rgb)
+
+
+def get_color_histogram(image: Image.Image, number_of_colors=20):
+    """
+    Get the most used colors of an image as each info: (percent of color in image, #code color as HEX, color name)
+    e.g. (56.361, '#FFBB00', 'Selective Yellow')
+    """
+    colors, counts, pixel_count = get_top_colors(image, number_of_colors)
+    names = get_color_names_of_colors(colors)
+    return [(round(int(count) * 100 / pixel_count, 3), f"#{int(color):06X}", str(name)) for color, count, name in zip(colors, counts, names)]
+
+
+def get_color_name_histogram(image: Image.Image, number_of_color_names=10, number_of_colors=1000):
+    """
+    Group the most used colors of an image by name as each info: (percent of color name in image, color name)
+    e.g. (60.5, 'Selective Yellow')
+    """
+    colors, counts, pixel_count = get_top_colors(image, number_of_colors)
+    names, inverse = np.unique(get_color_names_of_colors(colors).astype(str), return_inverse=True)
+    # Add up the rounded percent of each color, like the report always did
+    percents = [round(int(count) * 100 / pixel_count, 3) for count in counts]
+    totals = np.bincount(inverse.ravel(), weights=percents, minlength=len(names))
+    result = []
+    for name, total in zip(names, totals):
+        percent = round(float(total), 3)
+        result.append((0.001 if percent == 0.0 else percent, str(name)))
+    result.sort(reverse=True)
+    return result[:number_of_color_names]
+
+
+def get_dominant_colors(image: Image.Image, k=5, max_edge=64, attempts=3):
+    """
+    Cluster the colors of an image downscaled to max_edge in Lab space (k-means), so anti-aliased and gradient
+    pixels join the color they are perceived as. Each cluster as info: (percent of cluster in image, #code color as HEX, color name)
+    e.g. (56.361, '#FFBB00', 'Selective Yellow'), biggest cluster first
+    """
+    image = image.convert("RGB") if image.mode != "RGB" else image
+    if max(image.size) > max_edge:
+        image = image.resize(
+            (max(1, round(image.size[0] * max_edge / max(image.size))), max(1, round(image.size[1] * max_edge / max(image.size)))),
+            Image.BOX,
+        )
+    pixels = np.asarray(image, dtype=np.uint8).reshape(-1, 3)
+    k = min(k, len(np.unique(pixels, axis=0)))
+    if k <= 0:
+        return []
+    lab = rgb_to_lab(pixels)
+    cv2.setRNGSeed(0)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.5)
+    _, labels, centers = cv2.kmeans(lab, k, None, criteria, attempts, cv2.KMEANS_PP_CENTERS)
+    counts = np.bincount(labels.ravel(), minlength=k)
+    rgb = lab_to_rgb(centers)
+    names = color_names.find_many(rgb)
+    result = [(round(int(count) * 100 / len(pixels), 3), "#{:02X}{:02X}{:02X}".format(*color), str(name)) for count, color, name in zip(counts, rgb, names) if count]
+    result.sort(reverse=True)
+    return result
+
+
+def parse_colors(colors):
+    """
+    Colors as a (n, 3) RGB uint8 array from a '#RRGGBB' / '#RGB' string, an (r, g, b) tuple, or a list/array of them
+    """
+    if isinstance(colors, str):
+        colors = [colors]
+    if isinstance(colors, tuple) and len(colors) == 3 and all(isinstance(c, (int, np.integer)) for c in colors):
+        colors = [colors]
+    result = []
+    for color in colors:
+        if isinstance(color, str):
+            color = color.lstrip("#")
+            color = "".join(c * 2 for c in color) if len(color) == 3 else color
+            if len(color) != 6:
+                raise ValueError("Malformed hexadecimal color representation")
+            color = [int(color[i:i + 2], 16) for i in (0, 2, 4)]
+        result.append(tuple(color)[:3])
+    return np.array(result, dtype=np.uint8).reshape(-1, 3)
+
+
+def rgb_to_lab(rgb):
+    """(n, 3) RGB uint8 -> (n, 3) float32 CIE Lab (D65)"""
+    rgb = np.asarray(rgb, dtype=np.float32).reshape(-1, 1, 3) / 255
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2Lab).reshape(-1, 3)
+
+
+def lab_to_rgb(lab):
+    """(n, 3) CIE Lab -> (n, 3) RGB uint8"""
+    rgb = cv2.cvtColor(np.asarray(lab, dtype=np.float32).reshape(-1, 1, 3), cv2.COLOR_Lab2RGB).reshape(-1, 3)
+    return np.clip(np.rint(rgb * 255), 0, 255).astype(np.uint8)
+
+
+def delta_e_ciede2000(lab1, lab2):
+    """CIEDE2000 color difference between (n, 3) Lab arrays (broadcast), ~1 is just noticeable, >5 is clearly different"""
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    l1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    l2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    c_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    g = 0.5 * (1 - np.sqrt(c_mean**7 / (c_mean**7 + 25**7)))
+    a1, a2 = a1 * (1 + g), a2 * (1 + g)
+    c1, c2 = np.hypot(a1, b1), np.hypot(a2, b2)
+    h1 = np.degrees(np.arctan2(b1, a1)) % 360
+    h2 = np.degrees(np.arctan2(b2, a2)) % 360
+
+    delta_l = l2 - l1
+    delta_c = c2 - c1
+    delta_h = h2 - h1
+    delta_h = np.where(delta_h > 180, delta_h - 360, np.where(delta_h < -180, delta_h + 360, delta_h))
+    delta_h = np.where(c1 * c2 == 0, 0, delta_h)
+    delta_big_h = 2 * np.sqrt(c1 * c2) * np.sin(np.radians(delta_h) / 2)
+
+    l_mean = (l1 + l2) / 2
+    c_mean = (c1 + c2) / 2
+    h_sum = h1 + h2
+    h_mean = np.where(np.abs(h1 - h2) > 180, np.where(h_sum < 360, h_sum + 360, h_sum - 360), h_sum) / 2
+    h_mean = np.where(c1 * c2 == 0, h_sum, h_mean)
+
+    t = (
+        1
+        - 0.17 * np.cos(np.radians(h_mean - 30))
+        + 0.24 * np.cos(np.radians(2 * h_mean))
+        + 0.32 * np.cos(np.radians(3 * h_mean + 6))
+        - 0.20 * np.cos(np.radians(4 * h_mean - 63))
+    )
+    delta_theta = 30 * np.exp(-(((h_mean - 275) / 25) ** 2))
+    r_c = 2 * np.sqrt(c_mean**7 / (c_mean**7 + 25**7))
+    s_l = 1 + 0.015 * (l_mean - 50) ** 2 / np.sqrt(20 + (l_mean - 50) ** 2)
+    s_c = 1 + 0.045 * c_mean
+    s_h = 1 + 0.015 * c_mean * t
+    r_t = -np.sin(np.radians(2 * delta_theta)) * r_c
+
+    return np.sqrt((delta_l / s_l) ** 2 + (delta_c / s_c) ** 2 + (delta_big_h / s_h) ** 2 + r_t * (delta_c / s_c) * (delta_big_h / s_h))
+
+
+def assert_color_close(actual, expected, max_delta_e=2.3):
+    """
+    Assert that every actual color is within max_delta_e (CIEDE2000) of the expected color(s)
+    Colors are '#RRGGBB' strings, (r, g, b) tuples or lists/arrays of them, a single expected color applies to all actual colors
+    e.g. assert_color_close(page.get_dominant_colors(locator, 1)[0][1], "#FFBB00")
+    """
+    delta_e = delta_e_ciede2000(rgb_to_lab(parse_colors(actual)), rgb_to_lab(parse_colors(expected)))
+    assert_that(float(delta_e.max()), f"CIEDE2000 of {actual} and {expected}").is_less_than_or_equal_to(max_delta_e)
+    return delta_e
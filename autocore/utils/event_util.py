@@ -0,0 +1,151 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from getgauge.python import data_store
+from selenium.webdriver.common.bidi.session import session_subscribe
+
+from . import logger
+from .network_util import NetworkTracker
+
+BIDI_EVENTS = {
+    "log.entryAdded": "console",
+    "network.beforeRequestSent": "request",
+    "network.responseCompleted": "network",
+    "network.fetchError": "network",
+    "browsingContext.navigationStarted": "navigation",
+    "browsingContext.domContentLoaded": "navigation",
+    "browsingContext.load": "navigation",
+}
+
+
+class EventBuffers:
+    """Ring buffers of the events received during a spec, one per channel: console, request, network, navigation"""
+
+    def __init__(self, size: int = 500):
+        self._size = size
+        self._buffers = {}
+        self._condition = threading.Condition()
+
+    def push(self, channel: str, event: dict):
+        with self._condition:
+            self._buffers.setdefault(channel, deque(maxlen=self._size)).append(event)
+            self._condition.notify_all()
+
+    def get(self, channel: str, predicate=None):
+        with self._condition:
+            events = list(self._buffers.get(channel, []))
+        return events if predicate is None else [event for event in events if predicate(event)]
+
+    def wait_for(self, channel: str, predicate, timeout_in_seconds: float, since: float = 0):
+        """Wait for an event of a channel received after since (epoch seconds) which satisfies predicate, return it or None"""
+        deadline = time.time() + max(timeout_in_seconds, 0)
+        with self._condition:
+            while True:
+                event = next((event for event in self._buffers.get(channel, []) if event["time"] >= since and predicate(event)), None)
+                remaining = deadline - time.time()
+                if event is not None or remaining <= 0:
+                    return event
+                self._condition.wait(remaining)
+
+    def clear(self, channel: str = None):
+        with self._condition:
+            if channel is None:
+                self._buffers.clear()
+            else:
+                self._buffers.pop(channel, None)
+
+
+class BidiEvent:
+    """What WebSocketConnection.add_callback expects of an event: its name and how to read its params"""
+
+    def __init__(self, event_class: str):
+        self.event_class = event_class
+
+    def from_json(self, params):
+        return params
+
+
+def get_event_buffers():
+    """The EventBuffers of the current spec, created on first use"""
+    if not hasattr(data_store.spec, "event_buffers") or data_store.spec.event_buffers is None:
+        data_store.spec.event_buffers = EventBuffers(int(os.getenv("event_buffer_size", "500")))
+    return data_store.spec.event_buffers
+
+
+def is_subscribed(driver):
+    return driver.__dict__.get("event_tracker") is not None
+
+
+def subscribe_events(driver, events: list = None):
+    """
+    Subscribe to BiDi events of a driver started with enable_bidi (webSocketUrl), once per driver.
+    Events are pushed into the ring buffers of the running spec, request headers go to the header archive of the spec
+    and requests feed the driver's event_tracker (NetworkTracker).
+    """
+    if is_subscribed(driver):
+        return True
+    if not driver.caps.get("webSocketUrl"):
+        logger.warning("The driver is not started with BiDi (enable_bidi), events cannot be subscribed !!!")
+        return False
+    if driver._websocket_connection is None:
+        driver._start_bidi()
+    connection = driver._websocket_connection
+    tracker = NetworkTracker()
+    events = events or list(BIDI_EVENTS)
+    for event_name in events:
+        connection.add_callback(BidiEvent(event_name), get_event_handler(event_name, tracker))
+    connection.execute(session_subscribe(*events))
+    driver.__dict__["event_tracker"] = tracker
+    return True
+
+
+def get_event_handler(event_name: str, tracker: NetworkTracker):
+    channel = BIDI_EVENTS.get(event_name, event_name)
+
+    def handle(params):
+        try:
+            event = get_event_fields(event_name, params)
+            if channel in ["request", "network"]:
+                method = "Network.requestWillBeSent" if channel == "request" else "Network.loadingFinished"
+                tracker.feed(method, {"requestId": event["request_id"], "request": {"url": event["url"]}}, event["time"])
+            if channel == "request" and hasattr(data_store.spec, "archived_headers"):
+                data_store.spec.archived_headers.add_all([event["headers"]])
+            get_event_buffers().push(channel, event)
+        except Exception as exception:
+            logger.debug(exception)
+
+    return handle
+
+
+def get_event_fields(event_name: str, params: dict):
+    """Flatten the params of a BiDi event into the few fields the tests read"""
+    event = {"time": time.time(), "event": event_name}
+    if event_name == "log.entryAdded":
+        event.update({"level": params.get("level"), "text": params.get("text"), "url": (params.get("source") or {}).get("context")})
+    elif event_name.startswith("network."):
+        request = params.get("request") or {}
+        response = params.get("response") or {}
+        event.update(
+            {
+                "request_id": request.get("request"),
+                "url": request.get("url"),
+                "method": request.get("method"),
+                "status": response.get("status"),
+                "headers": get_header_values(response.get("headers") if response else request.get("headers")),
+            }
+        )
+    elif event_name.startswith("browsingContext."):
+        event.update({"url": params.get("url"), "context": params.get("context")})
+    return event
+
+
+def get_header_values(headers):
+    """BiDi headers [{"name": name, "value": {"type": "string", "value": value}}] -> {name: value}"""
+    return {header["name"]: (header.get("value") or {}).get("value") for header in headers or []}
+
+
+def match_url(url_pattern: str = None):
+    return lambda event: url_pattern is None or re.search(url_pattern, event.get("url") or "") is not None
@@ -1,13 +1,132 @@
-import pyautogui
+import functools
+import os
+import time
+from collections import namedtuple
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+from PIL import Image as PILImage
 from PIL.Image import Image
 
 from . import logger
 
+Box = namedtuple("Box", "left top width height")
+
+
+@dataclass
+class ImageMatch:
+    box: Box
+    score: float
+    scale: int
+    duration: float
+
+
+def to_gray(image):
+    """PIL image or BGR(A)/gray numpy array -> 2D uint8 numpy array"""
+    if isinstance(image, Image):
+        return np.asarray(image if image.mode == "L" else image.convert("L"))
+    image = np.asarray(image)
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+
+
+def scale_image(gray_image, scale: int = 100):
+    if scale == 100:
+        return gray_image
+    size = (max(1, int(gray_image.shape[1] * scale / 100)), max(1, int(gray_image.shape[0] * scale / 100)))
+    return cv2.resize(gray_image, size, interpolation=cv2.INTER_AREA if scale < 100 else cv2.INTER_LINEAR)
+
+
+def get_scaled_templates(img, list_scale=(100, 50, 200)):
+    """
+    Grayscale template at each scale as [(scale, numpy array)]
+    img is a PIL image, a numpy array or a file path, file paths are decoded once and cached by path and mtime
+    """
+    if isinstance(img, (str, os.PathLike)):
+        return load_scaled_templates(os.path.abspath(img), os.stat(img).st_mtime_ns, tuple(list_scale))
+    gray_img = to_gray(img)
+    return [(scale, scale_image(gray_img, scale)) for scale in list_scale]
+
+
+@functools.lru_cache(maxsize=64)
+def load_scaled_templates(file_path, mtime_ns, list_scale):
+    with PILImage.open(file_path) as img:
+        gray_img = to_gray(img)
+    templates = []
+    for scale in list_scale:
+        template = scale_image(gray_img, scale)
+        template.setflags(write=False)
+        templates.append((scale, template))
+    return templates
+
+
+def match_template(img, full_img, list_scale=(100, 50, 200), confidence: int = 85):
+    """
+    Find img in full_img with normalized cross correlation on grayscale images, one cv2.matchTemplate pass per scale.
+    The best location of all scales wins, it is a match if its score is at least confidence (0-100).
+    Args:
+        img: template (PIL image, numpy array or file path), full_img: image to search in (PIL image or numpy array)
+        list_scale: template scales in percent, the searching stops at the first scale which gives a (nearly) perfect match
+    Returns:
+        ImageMatch: box is None if the best score is below confidence
+    """
+    start = time.time()
+    best = match_scaled_templates(get_scaled_templates(img, list_scale), to_gray(full_img), confidence)
+    best.duration = time.time() - start
+    return best
+
+
+def find_images(list_img, full_img, list_scale=(100, 50, 200), confidence: int = 85):
+    """
+    Find several templates in one image, full_img is converted to grayscale once for all of them
+    e.g. find which of several dialogs is showing
+    Returns:
+        dict: {path of img, or index of img in list_img if it is an image: ImageMatch} in the order of list_img
+    """
+    gray_full_img = to_gray(full_img)
+    result = {}
+    for index, img in enumerate(list_img):
+        start = time.time()
+        try:
+            match = match_scaled_templates(get_scaled_templates(img, list_scale), gray_full_img, confidence)
+        except Exception as exception:
+            logger.error(exception)
+            match = ImageMatch(None, 0.0, None, 0.0)
+        match.duration = time.time() - start
+        result[img if isinstance(img, (str, os.PathLike)) else index] = match
+    return result
+
+
+def match_scaled_templates(templates, gray_full_img, confidence: int = 85):
+    best = ImageMatch(None, 0.0, None, 0.0)
+    best_location = None
+    for scale, template in templates:
+        if template.shape[0] > gray_full_img.shape[0] or template.shape[1] > gray_full_img.shape[1]:
+            continue
+        if template.min() == template.max():
+            # A flat template has no variance to correlate, compare the pixel values instead
+            result = 1 - cv2.matchTemplate(gray_full_img, template, cv2.TM_SQDIFF_NORMED)
+        else:
+            result = cv2.matchTemplate(gray_full_img, template, cv2.TM_CCOEFF_NORMED)
+            # A flat area of full_img has no variance either, its score is not a number
+            np.nan_to_num(result, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        _, score, _, location = cv2.minMaxLoc(result)
+        if score > best.score:
+            best = ImageMatch(None, float(score), scale, 0.0)
+            best_location = (location, template.shape)
+        if score >= 0.99:
+            break
+    if best_location is not None and best.score * 100 >= confidence:
+        (left, top), (height, width) = best_location
+        best.box = Box(left, top, width, height)
+    return best
+
 
 def get_box(img: Image, full_img: Image, scale: int = 100, confidence: int = 99):
     try:
-        with img.resize((int(img.size[0] * scale / 100), int(img.size[1] * scale / 100))) as baseline_image:
-            return pyautogui.locate(baseline_image, full_img, confidence=(confidence / 100))
+        return match_template(img, full_img, [scale], confidence).box
     except Exception as exception:
         logger.error(exception)
         return None
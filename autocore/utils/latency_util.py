@@ -0,0 +1,183 @@
+import re
+import threading
+from urllib.parse import urlsplit
+
+from assertpy import assert_that
+from getgauge.python import data_store
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+# Path segments which are ids of a resource: numbers, uuids and long hex / base64-like tokens
+ID_SEGMENT_PATTERNS = [
+    (re.compile(r"^\d+$"), "{id}"),
+    (re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"), "{uuid}"),
+    (re.compile(r"^(?=.*\d)[0-9a-fA-F]{16,}$"), "{hex}"),
+    (re.compile(r"^(?=.*\d)[A-Za-z0-9_\-]{24,}$"), "{token}"),
+]
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in microseconds: exact up to 128 us, then 64 linear sub buckets per power of 2,
+    so a percentile is within ~1.6% of the recorded value whatever its magnitude, in constant memory per magnitude.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def get_index(value: int):
+        if value < SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (value >> shift) - SUB_BUCKET_HALF
+
+    @staticmethod
+    def get_highest_value(index: int):
+        """Highest value counted in the bucket of index"""
+        if index < SUB_BUCKET_COUNT:
+            return index
+        shift = (index - SUB_BUCKET_COUNT) // SUB_BUCKET_HALF + 1
+        sub_bucket = (index - SUB_BUCKET_COUNT) % SUB_BUCKET_HALF + SUB_BUCKET_HALF
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value_ms: float):
+        value = max(int(value_ms * 1000), 0)
+        index = self.get_index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, percent: float):
+        """Latency in ms which percent % of the recorded latencies do not exceed, None if nothing is recorded"""
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * min(max(percent, 0), 100) // 100))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(self.get_highest_value(index), self.max) / 1000
+        return self.max / 1000
+
+    def mean(self):
+        return self.total / self.count / 1000 if self.count else None
+
+
+class LatencyRecorder:
+    """Latency histograms by endpoint: (method, host, templated path), e.g. ("GET", "api.example.com", "/users/{id}")"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, url: str, elapsed_seconds: float):
+        key = (method.upper(), *get_endpoint(url))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(elapsed_seconds * 1000)
+
+    def get(self, method: str, path: str):
+        """
+        Histogram of an endpoint, path is a url or a templated path. A path without host gets the requests of all hosts.
+        None if nothing is recorded
+        """
+        host, path = get_endpoint(path)
+        with self._lock:
+            if host:
+                return self._histograms.get((method.upper(), host, path))
+            histograms = [histogram for (key_method, _, key_path), histogram in self._histograms.items() if key_method == method.upper() and key_path == path]
+        if not histograms:
+            return None
+        merged = LatencyHistogram()
+        for histogram in histograms:
+            merged.merge(histogram)
+        return merged
+
+    def get_summary(self, percents=(50, 90, 99)):
+        """[(method, host, path, count, mean ms, percentile ms..., max ms)] sorted by endpoint"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        return [(*key, histogram.count, histogram.mean(), *[histogram.percentile(percent) for percent in percents], histogram.max / 1000) for key, histogram in histograms]
+
+
+def get_endpoint(url: str):
+    """(host, templated path) of a url, host is "" for a bare path"""
+    if "://" in url:
+        parts = urlsplit(url)
+        return parts.netloc.lower(), get_path_template(parts.path)
+    return "", get_path_template(url)
+
+
+def get_path_template(url: str):
+    """/users/42/orders/9f1c... -> /users/{id}/orders/{hex}, a path with placeholders ({...}) is kept as it is"""
+    path = urlsplit(url).path if "://" in url else url.split("?")[0]
+    segments = []
+    for segment in (path or "/").split("/"):
+        for pattern, placeholder in ID_SEGMENT_PATTERNS:
+            if pattern.match(segment):
+                segment = placeholder
+                break
+        segments.append(segment)
+    return "/".join(segments)
+
+
+def get_latency_recorder(scope: str = "spec"):
+    """The LatencyRecorder of the current spec or of the suite, created on first use"""
+    store = data_store.spec if scope == "spec" else data_store.suite
+    if not hasattr(store, "api_latency") or store.api_latency is None:
+        store.api_latency = LatencyRecorder()
+    return store.api_latency
+
+
+def record_latency(method: str, url: str, elapsed_seconds: float):
+    """Record the latency of a request into the spec and suite recorders"""
+    if elapsed_seconds is None:
+        return
+    get_latency_recorder("spec").record(method, url, elapsed_seconds)
+    get_latency_recorder("suite").record(method, url, elapsed_seconds)
+
+
+def assert_latency(method: str, path: str, percent: float, max_ms: float, scope: str = "spec"):
+    """
+    Assert that percent % of the requests of an endpoint took at most max_ms, over the current spec (or the suite)
+    path is a url (one host) or a templated path (all hosts), e.g. assert_latency("GET", "/users/{id}", 95, 300)
+    """
+    histogram = get_latency_recorder(scope).get(method, path)
+    endpoint = f"{method.upper()} {''.join(get_endpoint(path))}"
+    assert_that(histogram, f"Latency of {endpoint} over this {scope}").is_not_none()
+    actual_ms = histogram.percentile(percent)
+    assert_that(actual_ms, f"p{percent:g} of {endpoint} over this {scope} ({histogram.count} requests) in ms").is_less_than_or_equal_to(max_ms)
+    return actual_ms
+
+
+def get_latency_table(scope: str = "suite", percents=(50, 90, 99)):
+    """The latency summary of all endpoints as a text table, None if nothing is recorded"""
+    summary = get_latency_recorder(scope).get_summary(percents)
+    if not summary:
+        return None
+    header = ["Method", "Host", "Path", "Count", "Mean ms", *[f"p{percent:g} ms" for percent in percents], "Max ms"]
+    rows = [[str(cell) if isinstance(cell, (int, str)) else f"{cell:.1f}" for cell in row] for row in summary]
+    widths = [max(len(row[column]) for row in [header, *rows]) for column in range(len(header))]
+    lines = [" | ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in [header, *rows]]
+    lines.insert(1, "-+-".join("-" * width for width in widths))
+    return "\n".join(lines)
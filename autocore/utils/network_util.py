@@ -0,0 +1,193 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from . import logger
+
+
+class NetworkTracker:
+    """
+    Track in-flight requests by requestId from Network.* events:
+    requestWillBeSent adds a request, loadingFinished / loadingFailed removes it.
+    """
+
+    def __init__(self):
+        self.inflight = {}
+        self.last_activity = time.time()
+
+    def feed(self, method: str, params: dict, timestamp: float = None):
+        """timestamp is the epoch time (seconds) of the event, defaults to now"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        request_id = params.get("requestId")
+        if request_id is None:
+            return
+        if method == "Network.requestWillBeSent":
+            url = params.get("request", {}).get("url", "")
+            if url.startswith("data:") or url.startswith("blob:"):
+                return
+            # A redirect is sent again with the same requestId
+            self.inflight[request_id] = url
+            self.last_activity = max(self.last_activity, timestamp)
+        elif method in ["Network.loadingFinished", "Network.loadingFailed"]:
+            if self.inflight.pop(request_id, None) is not None:
+                self.last_activity = max(self.last_activity, timestamp)
+
+    def is_idle(self, idle_ms: int = 500, max_inflight: int = 0):
+        return len(self.inflight) <= max_inflight and (time.time() - self.last_activity) * 1000 >= idle_ms
+
+    def reset(self):
+        self.inflight = {}
+        self.last_activity = time.time()
+
+
+CAPTURED_METHODS = ["Network.requestWillBeSent", "Network.requestWillBeSentExtraInfo", "Network.loadingFinished", "Network.loadingFailed"]
+METHOD_PATTERN = re.compile(r'"method":\s*"([^"]+)"')
+
+
+class PerformanceLog:
+    """
+    The single reader of a Chrome driver's performance log: get_log("performance") empties the browser buffer,
+    so every reader goes through read(), which feeds the NetworkTracker and keeps the captured messages
+    until they are taken with take_messages().
+    Only the messages of the captured methods are parsed, and only the fields the readers need are kept.
+    """
+
+    def __init__(self, driver, max_messages: int = 10000):
+        self._driver = driver
+        self._lock = threading.Lock()
+        self._messages = deque(maxlen=max_messages)
+        self.tracker = NetworkTracker()
+        self.methods = set(CAPTURED_METHODS)
+        self.url_pattern = None
+
+    def read(self):
+        """Drain the browser buffer, return the number of captured messages read"""
+        with self._lock:
+            count = 0
+            for entry in self._driver.get_log("performance"):
+                message = entry.get("message", "")
+                method = METHOD_PATTERN.search(message)
+                if method is None or method.group(1) not in self.methods:
+                    continue
+                try:
+                    log = get_captured_fields(json.loads(message)["message"])
+                except Exception as exception:
+                    logger.debug(exception)
+                    continue
+                self.tracker.feed(log["method"], log["params"], entry["timestamp"] / 1000 if entry.get("timestamp") else None)
+                url = log["params"].get("request", {}).get("url")
+                if url is not None and self.url_pattern is not None and not self.url_pattern.search(url):
+                    continue
+                self._messages.append(log)
+                count += 1
+            return count
+
+    def take_messages(self):
+        """Read the browser buffer and return (and forget) all the kept Network.* messages"""
+        self.read()
+        with self._lock:
+            messages = list(self._messages)
+            self._messages.clear()
+            return messages
+
+    def reset(self):
+        with self._lock:
+            self._messages.clear()
+            self.tracker.reset()
+
+
+class HeaderArchive:
+    """
+    Request headers seen during a spec, indexed by lower case header name -> unique values in the order they are seen.
+    At most max_values values are kept, the least recently used header names lose their oldest values first.
+    """
+
+    def __init__(self, max_values: int = 1000):
+        self._max_values = max_values
+        self._headers = OrderedDict()
+        self._size = 0
+
+    def add(self, name: str, value):
+        name = name.lower()
+        values = self._headers.get(name)
+        if values is None:
+            values = self._headers[name] = OrderedDict()
+        self._headers.move_to_end(name)
+        if value in values:
+            return
+        values[value] = None
+        self._size += 1
+        while self._size > self._max_values:
+            oldest_name, oldest_values = next(iter(self._headers.items()))
+            oldest_values.popitem(last=False)
+            self._size -= 1
+            if not oldest_values:
+                del self._headers[oldest_name]
+
+    def add_all(self, headers: list):
+        """Add a list of header dicts"""
+        for header in headers or []:
+            for name, value in header.items():
+                if isinstance(value, (str, int, float, bool)):
+                    self.add(name, value)
+
+    def get(self, name: str):
+        """Unique values of a header in the order they are seen, None if it is not seen"""
+        name = name.lower()
+        values = self._headers.get(name)
+        if not values:
+            return None
+        self._headers.move_to_end(name)
+        return list(values)
+
+    def __len__(self):
+        return self._size
+
+
+def get_performance_log(driver):
+    """The PerformanceLog of a driver, created on first use"""
+    if "performance_log" not in driver.__dict__:
+        driver.__dict__["performance_log"] = PerformanceLog(driver)
+    return driver.__dict__["performance_log"]
+
+
+def get_captured_fields(log: dict):
+    """Keep the method, the request id, url and headers of a Network.* message"""
+    params = log.get("params") or {}
+    captured = {key: params[key] for key in ["requestId", "headers", "type"] if key in params}
+    if isinstance(params.get("request"), dict):
+        captured["request"] = {key: params["request"][key] for key in ["url", "method", "headers"] if key in params["request"]}
+    return {"method": log.get("method", ""), "params": captured}
+
+
+def is_network_capture_on(driver):
+    return driver.__dict__.get("network_capture", False)
+
+
+def start_network_capture(driver, url_pattern: str = None, methods: list = None):
+    """
+    Turn the CDP Network domain of the current window on, so that Chrome reports network events into the performance log
+    until stop_network_capture. The driver is created with perfLoggingPrefs.enableNetwork off, so nothing else turns it on.
+    Args:
+        url_pattern (str, optional): [Regex, only the requests with a matching url are kept for the header readers]
+        methods (list, optional): [Network.* event names to keep]. Defaults to CAPTURED_METHODS.
+    """
+    performance_log = get_performance_log(driver)
+    performance_log.methods = set(methods or CAPTURED_METHODS) | {"Network.requestWillBeSent", "Network.loadingFinished", "Network.loadingFailed"}
+    performance_log.url_pattern = re.compile(url_pattern) if url_pattern else None
+    if not is_network_capture_on(driver):
+        # No response body is needed, keep Chrome's network buffers small
+        driver.execute_cdp_cmd("Network.enable", {"maxTotalBufferSize": 1024 * 1024, "maxResourceBufferSize": 256 * 1024})
+        performance_log.tracker.reset()
+        driver.__dict__["network_capture"] = True
+    return True
+
+
+def stop_network_capture(driver):
+    """Turn the CDP Network domain off, the messages read so far are kept for the header readers"""
+    driver.execute_cdp_cmd("Network.disable", {})
+    driver.__dict__["network_capture"] = False
+    get_performance_log(driver).read()
+    return True
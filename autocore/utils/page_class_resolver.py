@@ -0,0 +1,204 @@
+import ast
+import hashlib
+import json
+import os
+
+from . import logger
+
+ROOT_PAGE_CLASSES = ["WebPage", "WebPage2", "WebPage3", "MobileScreen"]
+DRIVER_CONFIGURATIONS = ["ChromeOpts", "MobileCapabilities"]
+CACHE_VERSION = 2
+
+
+class PageClassResolver:
+    """
+    Parse each step module once with ast and resolve the page class (WebPage, WebPage2, WebPage3, MobileScreen)
+    at the root of every step owner's MRO.
+    Parsed modules are cached on disk by content hash so unchanged modules are not parsed again on the next run.
+    """
+
+    def __init__(self, cache_file: str = None):
+        self._cache_file = cache_file
+        self._cache = self._load_cache()
+        self._used_hashes = set()
+        self._dirty = False
+        self._modules = {}
+        self._roots = {}
+
+    # ==================================================
+    # Modules
+    # ==================================================
+
+    def load_module(self, file_path):
+        """Parse a module (or take it from the cache if its content is unchanged) and return its record."""
+        try:
+            with open(file_path, "rb") as data:
+                content = data.read()
+            content_hash = hashlib.sha1(content).hexdigest()
+            record = self._cache.get(content_hash)
+            if record is None:
+                record = parse_module(content, file_path)
+                self._cache[content_hash] = record
+                self._dirty = True
+            self._used_hashes.add(content_hash)
+            self._modules[file_path] = record
+        except Exception as exception:
+            logger.warning(f"Cannot parse {file_path}: {exception}")
+            self._modules[file_path] = {"imports": {}, "classes": {}, "steps": []}
+        self._roots = {}
+        return self._modules[file_path]
+
+    def get_module(self, file_path):
+        return self._modules.get(file_path, {"imports": {}, "classes": {}, "steps": []})
+
+    def drop_module(self, file_path):
+        self._modules.pop(file_path, None)
+        self._roots = {}
+
+    def save(self):
+        """Write the cache of the modules used in this run, if anything has been parsed."""
+        try:
+            if self._cache_file is None or not self._dirty:
+                return False
+            os.makedirs(os.path.dirname(self._cache_file), exist_ok=True)
+            modules = {key: value for key, value in self._cache.items() if key in self._used_hashes}
+            with open(self._cache_file, "w", encoding="utf-8") as data:
+                json.dump({"version": CACHE_VERSION, "modules": modules}, data)
+            self._dirty = False
+            return True
+        except Exception as exception:
+            logger.warning(exception)
+            return False
+
+    def _load_cache(self):
+        try:
+            if self._cache_file is not None and os.path.exists(self._cache_file):
+                with open(self._cache_file, "r", encoding="utf-8") as data:
+                    cache = json.load(data)
+                if cache.get("version") == CACHE_VERSION:
+                    return cache.get("modules", {})
+        except Exception as exception:
+            logger.warning(exception)
+        return {}
+
+    # ==================================================
+    # Resolving
+    # ==================================================
+
+    def resolve(self, file_path, class_name):
+        """Return the first root page class in the MRO of class_name defined in file_path, None if there is not any."""
+        if class_name is None:
+            return None
+        key = (file_path, class_name)
+        if key not in self._roots:
+            mro = self._get_mro(key, [])
+            self._roots[key] = next((item for item in mro if item in ROOT_PAGE_CLASSES), None)
+        return self._roots[key]
+
+    def _get_mro(self, node, visiting):
+        if not isinstance(node, tuple):
+            return [node]
+        if node in visiting:
+            return [node]
+        file_path, class_name = node
+        bases = [self._find_base(file_path, base) for base in self._modules[file_path]["classes"][class_name]["bases"]]
+        base_mros = [self._get_mro(base, visiting + [node]) for base in bases]
+        return [node] + c3_merge(base_mros + [bases])
+
+    def _find_base(self, file_path, base):
+        """Map a base expression of a class in file_path to a (file_path, class_name) node or a plain name."""
+        record = self._modules[file_path]
+        parts = base.split(".")
+        name = parts[-1]
+        if len(parts) == 1:
+            if name in record["classes"]:
+                return (file_path, name)
+            if name in record["imports"]:
+                module, imported_name = record["imports"][name]
+                name = imported_name or name
+                return self._find_class(name, module)
+        return name if name in ROOT_PAGE_CLASSES else self._find_class(name, ".".join(parts[:-1]) or None)
+
+    def _find_class(self, class_name, module=None):
+        if class_name in ROOT_PAGE_CLASSES:
+            return class_name
+        candidates = [file_path for file_path, record in self._modules.items() if class_name in record["classes"]]
+        if module:
+            module_name = module.split(".")[-1]
+            candidates = [file_path for file_path in candidates if os.path.splitext(os.path.basename(file_path))[0] == module_name] or candidates
+        return (candidates[0], class_name) if candidates else class_name
+
+
+# ==================================================
+# Parsing
+# ==================================================
+
+
+def parse_module(content, file_path=None):
+    """
+    Build a JSON serializable record of a step module:
+        imports: {alias: [module, name]}
+        classes: {name: {"bases": [dotted base], "line": line}}
+        steps: [{"texts": [[text, line]], "class": owner class name, "function": function name, "configures_driver": bool}]
+    """
+    tree = ast.parse(content, filename=file_path or "<unknown>")
+    record = {"imports": {}, "classes": {}, "steps": []}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                record["imports"][alias.asname or alias.name] = [node.module or "", alias.name]
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                record["imports"][alias.asname or alias.name.split(".")[0]] = [alias.name, None]
+
+    def visit(node, owner):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                record["classes"][child.name] = {"bases": [b for b in (get_dotted_name(base) for base in child.bases) if b], "line": child.lineno}
+                visit(child, child.name)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                texts = [text for decorator in child.decorator_list for text in get_step_texts(decorator)]
+                if texts:
+                    names = {get_dotted_name(item).split(".")[-1] for item in ast.walk(child) if isinstance(item, (ast.Name, ast.Attribute))}
+                    record["steps"].append({"texts": texts, "class": owner, "function": child.name, "configures_driver": any(name in names for name in DRIVER_CONFIGURATIONS)})
+
+    visit(tree, None)
+    return record
+
+
+def get_step_texts(decorator):
+    if not isinstance(decorator, ast.Call) or get_dotted_name(decorator.func).split(".")[-1] != "step" or not decorator.args:
+        return []
+    argument = decorator.args[0]
+    items = argument.elts if isinstance(argument, (ast.List, ast.Tuple)) else [argument]
+    return [[item.value, item.lineno] for item in items if isinstance(item, ast.Constant) and isinstance(item.value, str)]
+
+
+def get_dotted_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        parent = get_dotted_name(node.value)
+        return f"{parent}.{node.attr}" if parent else node.attr
+    if isinstance(node, ast.Call):
+        return get_dotted_name(node.func)
+    return ""
+
+
+def c3_merge(sequences):
+    """C3 linearization merge, falls back to depth-first order if the hierarchy is inconsistent."""
+    sequences = [list(sequence) for sequence in sequences if sequence]
+    result = []
+    while sequences:
+        for sequence in sequences:
+            head = sequence[0]
+            if not any(head in other[1:] for other in sequences):
+                break
+        else:
+            for sequence in sequences:
+                result.extend(item for item in sequence if item not in result)
+            return result
+        result.append(head)
+        sequences = [[item for item in sequence if item != head] for sequence in sequences]
+        sequences = [sequence for sequence in sequences if sequence]
+    return result
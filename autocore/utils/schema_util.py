@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urljoin
+
+from jsonschema import Draft202012Validator
+from jsonschema.validators import validator_for
+from referencing import Registry, Resource
+from referencing.exceptions import NoSuchResource
+from referencing.jsonschema import DRAFT202012
+
+from . import logger
+
+MAX_ERRORS = 20
+
+# Compiled validators: by id of the schema object first (no hashing for the same dict), then by hash of its content
+_validators_by_id = OrderedDict()
+_validators_by_hash = OrderedDict()
+_validators_lock = threading.Lock()
+# Schemas loaded from a directory by name, their file uris (by id of the schema), and the registry which resolves the $ref between them
+_named_schemas = {}
+_schema_uris = {}
+_registry = Registry(retrieve=lambda uri: retrieve_by_id_base(uri))
+# Base uri of a loaded $id -> base file uri of its schema, so that a relative $ref of a schema with an http $id finds the files next to it
+_id_base_uris = {}
+
+
+def get_schema_hash(schema: dict):
+    return hashlib.sha1(json.dumps(schema, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def get_validator(schema, max_validators: int = 256):
+    """
+    The compiled validator of a schema (dict or name of a loaded schema), checked against its metaschema and built once.
+    The validator class comes from $schema, Draft 2020-12 if it is not set.
+    """
+    if isinstance(schema, str):
+        if schema not in _named_schemas:
+            raise KeyError(f"Schema {schema} is not loaded, please use load_schemas(directory) or json_schema_dir")
+        schema = _named_schemas[schema]
+    with _validators_lock:
+        cached = _validators_by_id.get(id(schema))
+        if cached is not None and cached[0] is schema:
+            _validators_by_id.move_to_end(id(schema))
+            return cached[1]
+    # A loaded schema is hashed with its file uri: the same content in two files may not resolve the same $ref
+    root_schema = get_root_schema(schema)
+    schema_hash = get_schema_hash(root_schema)
+    with _validators_lock:
+        validator = _validators_by_hash.get(schema_hash)
+    if validator is None:
+        validator_class = validator_for(schema, default=Draft202012Validator)
+        validator_class.check_schema(schema)
+        validator = validator_class(root_schema, registry=_registry)
+    with _validators_lock:
+        _validators_by_hash[schema_hash] = validator
+        _validators_by_hash.move_to_end(schema_hash)
+        # The schema is kept with its validator, so its id cannot be reused by another object while it is cached
+        _validators_by_id[id(schema)] = (schema, validator)
+        _validators_by_id.move_to_end(id(schema))
+        for validators in [_validators_by_id, _validators_by_hash]:
+            while len(validators) > max_validators:
+                validators.popitem(last=False)
+    return validator
+
+
+def get_root_schema(schema: dict):
+    """
+    The schema a validator starts from: a loaded schema is referenced by its file uri,
+    so that its relative $ref resolve from the file which contains it
+    """
+    loaded = _schema_uris.get(id(schema))
+    if loaded is None or loaded[0] is not schema:
+        return schema
+    return {"$schema": schema["$schema"], "$ref": loaded[1]} if "$schema" in schema else {"$ref": loaded[1]}
+
+
+def retrieve_by_id_base(uri: str):
+    """Find a uri relative to the $id of a loaded schema (e.g. https://example.com/users/addr.json) among the loaded files"""
+    for id_base_uri, file_base_uri in _id_base_uris.items():
+        if uri.startswith(id_base_uri):
+            try:
+                return _registry[file_base_uri + uri[len(id_base_uri) :]]
+            except LookupError:
+                pass
+    raise NoSuchResource(ref=uri)
+
+
+def get_errors(json_data, schema, max_errors: int = MAX_ERRORS):
+    """
+    Validate json_data, return at most max_errors errors as [{"path": "/items/0/id", "message": ..., "validator": "type"}]
+    An empty list means json_data is valid.
+    """
+    errors = []
+    for error in get_validator(schema).iter_errors(json_data):
+        errors.append({"path": "/" + "/".join(str(part) for part in error.absolute_path), "message": error.message, "validator": error.validator})
+        if len(errors) >= max_errors:
+            break
+    return errors
+
+
+def validate_json(json_data, schema, max_errors: int = MAX_ERRORS):
+    """
+    get_errors with the duration of the validation logged
+    Returns:
+        tuple: (errors, elapsed seconds)
+    """
+    start_time = time.time()
+    errors = get_errors(json_data, schema, max_errors)
+    elapsed = time.time() - start_time
+    name = schema if isinstance(schema, str) else schema.get("$id", schema.get("title", "schema"))
+    if errors:
+        logger.error(f"JSON is not valid against {name} ({len(errors)}{'+' if len(errors) >= max_errors else ''} error(s) in {elapsed * 1000:.3f} ms): {errors}")
+    else:
+        logger.debug(f"JSON is valid against {name} in {elapsed * 1000:.3f} ms")
+    return errors, elapsed
+
+
+def load_schemas(directory: str):
+    """
+    Load and compile the *.json schemas of a directory (and its sub directories) once.
+    A schema is named by its path relative to directory without extension (e.g. users/user), and its $id if it has one.
+    A $ref between loaded schemas is resolved by $id or relative to the file which contains it (e.g. "$ref": "addr.json" in users/user.json),
+    also when the schema has an http $id.
+    Returns:
+        list: names of the loaded schemas
+    """
+    global _registry
+    schemas = {}
+    for root, _, files in os.walk(directory):
+        for file_name in sorted(files):
+            if not file_name.lower().endswith(".json"):
+                continue
+            file_path = os.path.join(root, file_name)
+            try:
+                with open(file_path, encoding="utf-8") as file:
+                    schemas[os.path.relpath(file_path, directory).replace(os.sep, "/")] = (pathlib.Path(file_path).resolve().as_uri(), json.load(file))
+            except Exception as exception:
+                logger.error(f"{file_path}: {exception}")
+    resources = []
+    for relative_path, (uri, schema) in schemas.items():
+        resource = Resource.from_contents(schema, default_specification=DRAFT202012)
+        # By file uri first: the base uri of the schema, a relative $ref resolves from the file which contains it
+        resources.extend([(uri, resource), (relative_path, resource)])
+        if schema.get("$id"):
+            resources.append((schema["$id"], resource))
+            _id_base_uris[urljoin(schema["$id"], ".")] = urljoin(uri, ".")
+    _registry = _registry.with_resources(resources).crawl()
+    with _validators_lock:
+        # Validators compiled before know nothing of the new resources
+        _validators_by_id.clear()
+        _validators_by_hash.clear()
+    names = []
+    for relative_path, (uri, schema) in schemas.items():
+        name = os.path.splitext(relative_path)[0]
+        _named_schemas[name] = schema
+        _schema_uris[id(schema)] = (schema, uri)
+        if schema.get("$id"):
+            _named_schemas[schema["$id"]] = schema
+        try:
+            get_validator(schema)
+            names.append(name)
+        except Exception as exception:
+            logger.error(f"Schema {name} is not valid: {exception}")
+    logger.debug(f"Loaded {len(names)} JSON schema(s) from {directory}")
+    return names
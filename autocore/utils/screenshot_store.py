@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+from PIL import Image
+
+from . import logger
+
+
+class ScreenshotStore:
+    """
+    Name screenshots by their content so identical captures share one file in the report.
+    A capture is a list of tiles (raw PNG bytes or PIL images), one per driver.
+    Captures with the same bytes resolve to the same file (sha1, no decoding).
+    With max_distance >= 0, a capture whose tiles all have a perceptual hash (dHash) within max_distance bits
+    of a written one is linked to that file instead of being encoded again (see find_similar, run by the writer).
+    """
+
+    def __init__(self, directory: str, max_distance: int = -1):
+        self._directory = directory
+        self._max_distance = max_distance
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._perceptual = []
+
+    def reserve(self, tiles: list, extension: str = ".png", prefix: str = "screenshot", tc_id=None):
+        """Return (file_name, is_new), the caller has to write the file only if is_new is True."""
+        content_hash = get_content_hash(tiles, f"{prefix}{extension}")
+        with self._lock:
+            if content_hash in self._exact:
+                file_name = self._exact[content_hash]
+                logger.debug(f"Screenshot is the same as {file_name}, it is not written again")
+                return file_name, False
+            file_name = os.path.join(self._directory, f"{prefix}-{tc_id}-{content_hash[:20]}{extension}")
+            self._exact[content_hash] = file_name
+            return file_name, True
+
+    @property
+    def is_perceptual(self):
+        return self._max_distance >= 0
+
+    def find_similar(self, tiles: list, file_name: str):
+        """
+        Decode and dHash the tiles of a reserved file, meant for the writer thread
+        Returns:
+            tuple: (a written file the tiles are similar to or None, dhashes to pass to add_similar once file_name is written)
+        """
+        if not self.is_perceptual:
+            return None, None
+        dhashes = [get_dhash(tile) for tile in tiles]
+        if not dhashes or any(dhash is None for dhash in dhashes):
+            return None, None
+        kind = os.path.splitext(file_name)[1]
+        with self._lock:
+            for stored_dhashes, stored_kind, stored_file_name in self._perceptual:
+                if stored_kind == kind and len(stored_dhashes) == len(dhashes):
+                    if all(bin(stored ^ dhash).count("1") <= self._max_distance for stored, dhash in zip(stored_dhashes, dhashes)):
+                        return stored_file_name, dhashes
+        return None, dhashes
+
+    def add_similar(self, dhashes, file_name: str):
+        if dhashes:
+            with self._lock:
+                self._perceptual.append((dhashes, os.path.splitext(file_name)[1], file_name))
+
+    def __len__(self):
+        return len(self._exact)
+
+
+def get_content_hash(tiles: list, kind: str = ""):
+    content_hash = hashlib.sha1(kind.encode())
+    for tile in tiles:
+        if isinstance(tile, bytes):
+            content_hash.update(tile)
+        else:
+            content_hash.update(f"{tile.mode}{tile.size}".encode())
+            content_hash.update(tile.tobytes())
+    return content_hash.hexdigest()
+
+
+def get_dhash(tile, hash_size: int = 8):
+    """64 bits difference hash: compare each pixel with its right neighbour on a 9x8 grayscale thumbnail"""
+    try:
+        image = Image.open(BytesIO(tile)) if isinstance(tile, bytes) else tile
+        small = image.resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0).convert("L")
+        pixels = list(small.getdata())
+        dhash = 0
+        for row in range(hash_size):
+            for col in range(hash_size):
+                left = pixels[row * (hash_size + 1) + col]
+                right = pixels[row * (hash_size + 1) + col + 1]
+                dhash = (dhash << 1) | (left > right)
+        return dhash
+    except Exception as exception:
+        logger.warning(exception)
+        return None
@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from . import logger
+
+
+class ScreenshotWriter:
+    """
+    Run the heavy part of screenshots (decoding, compositing, encoding and writing) on background workers.
+    At most max_pending jobs are queued or running, submitting more blocks the caller until a job is done,
+    so the raw captures held in memory stay capped on screenshot-heavy suites.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="screenshot-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._futures = set()
+
+    def submit(self, function, *args):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def drain(self, timeout_in_seconds: float = None):
+        """Wait for all submitted jobs, return the number of jobs which are still not done"""
+        with self._lock:
+            futures = list(self._futures)
+        if not futures:
+            return 0
+        done, not_done = wait(futures, timeout=timeout_in_seconds)
+        if not_done:
+            logger.warning(f"{len(not_done)} screenshot(s) are still not written after {timeout_in_seconds} seconds !!!")
+        return len(not_done)
+
+    def _on_done(self, future):
+        with self._lock:
+            self._futures.discard(future)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(future.exception())
@@ -0,0 +1,176 @@
+import os
+import re
+from dataclasses import dataclass
+
+from . import logger
+from .page_class_resolver import PageClassResolver
+
+SKIPPED_DIRS = ["__pycache__", "reports", "logs", "download", "venv", ".venv", "env", "node_modules"]
+
+
+@dataclass
+class StepEntry:
+    file_path: str
+    line_number: int
+    page_class: str
+    testing_type: str
+    configures_driver: bool = False
+
+
+def normalize_step(step: str):
+    """Normalize a step text so that spec steps and implementation steps share the same key
+    e.g:\n
+    normalize_step('[Dialog] Select "OK" radio button') -> [Dialog] Select arg radio button\n
+    normalize_step("[Dialog] Select <text> radio button") -> [Dialog] Select arg radio button
+    """
+    step = re.sub('"(.+?)"', "arg", step.strip())
+    step = re.sub("<(.+?)>", "arg", step)
+    return " ".join(step.split())
+
+
+def get_step_impl_dirs(project_path):
+    step_impl_dir = os.environ.get("STEP_IMPL_DIR") or "step_impl"
+    return [os.path.join(project_path, s_i_d.strip()) for s_i_d in step_impl_dir.split(",") if s_i_d.strip()]
+
+
+def get_spec_dirs(project_path):
+    specs_dir = os.environ.get("gauge_specs_dir") or "specs"
+    return [os.path.join(project_path, s_d.strip()) for s_d in specs_dir.split(",") if s_d.strip()]
+
+
+class StepIndex:
+    """Map of normalized step text -> StepEntry, built once and refreshed per file when its mtime changes."""
+
+    def __init__(self, step_impl_dirs: list, resolver: PageClassResolver = None):
+        self._step_impl_dirs = step_impl_dirs
+        self._resolver = resolver if resolver is not None else PageClassResolver()
+        self._mtimes = {}
+        self._steps = {}
+        # Unknown step texts (concept steps, typos...) until the index changes, so that they do not walk the step files again
+        self._misses = set()
+        self.refresh()
+
+    def refresh(self):
+        """Re-parse only the files which are new or have a different mtime, drop the removed ones."""
+        try:
+            current = {}
+            for step_impl_dir in self._step_impl_dirs:
+                for path, subdirs, files in os.walk(step_impl_dir):
+                    subdirs[:] = [d for d in subdirs if d not in SKIPPED_DIRS and not d.startswith(".")]
+                    for name in files:
+                        if name[-3:] == ".py":
+                            file_path = os.path.join(path, name)
+                            current[file_path] = os.stat(file_path).st_mtime_ns
+
+            changed = False
+            for file_path in [f for f in self._mtimes if f not in current]:
+                self._mtimes.pop(file_path)
+                self._resolver.drop_module(file_path)
+                changed = True
+            for file_path, mtime in current.items():
+                if self._mtimes.get(file_path) != mtime:
+                    self._resolver.load_module(file_path)
+                    self._mtimes[file_path] = mtime
+                    changed = True
+
+            if changed:
+                self._build()
+                self._resolver.save()
+            return changed
+        except Exception as exception:
+            logger.error(exception)
+            return False
+
+    def lookup(self, step: str):
+        """Return the StepEntry of a step text, refresh the index once if the step is unknown and has not been missed since the last change."""
+        key = normalize_step(step)
+        entry = self._steps.get(key)
+        if entry is None and key not in self._misses:
+            if self.refresh():
+                entry = self._steps.get(key)
+            if entry is None:
+                self._misses.add(key)
+        return entry
+
+    def __len__(self):
+        return len(self._steps)
+
+    def _build(self):
+        self._steps = {}
+        self._misses = set()
+        for file_path in sorted(self._mtimes):
+            for function in self._resolver.get_module(file_path)["steps"]:
+                testing_type = self._resolver.resolve(file_path, function["class"])
+                for text, line_number in function["texts"]:
+                    self._steps.setdefault(normalize_step(text), StepEntry(file_path, line_number, function["class"], testing_type, function.get("configures_driver", False)))
+
+
+class ConceptIndex:
+    """Map of normalized concept heading -> step texts of the concept (*.cpt of the spec dirs), refreshed per file when its mtime changes."""
+
+    def __init__(self, spec_dirs: list):
+        self._spec_dirs = spec_dirs
+        self._mtimes = {}
+        self._files = {}
+        self._concepts = {}
+        self.refresh()
+
+    def refresh(self):
+        """Re-parse only the concept files which are new or have a different mtime, drop the removed ones."""
+        try:
+            current = {}
+            for spec_dir in self._spec_dirs:
+                for path, subdirs, files in os.walk(spec_dir):
+                    subdirs[:] = [d for d in subdirs if d not in SKIPPED_DIRS and not d.startswith(".")]
+                    for name in files:
+                        if name[-4:] == ".cpt":
+                            file_path = os.path.join(path, name)
+                            current[file_path] = os.stat(file_path).st_mtime_ns
+
+            changed = False
+            for file_path in [f for f in self._mtimes if f not in current]:
+                self._mtimes.pop(file_path)
+                self._files.pop(file_path)
+                changed = True
+            for file_path, mtime in current.items():
+                if self._mtimes.get(file_path) != mtime:
+                    self._files[file_path] = parse_concepts(file_path)
+                    self._mtimes[file_path] = mtime
+                    changed = True
+
+            if changed:
+                self._concepts = {}
+                for file_path in sorted(self._files):
+                    for heading, steps in self._files[file_path].items():
+                        self._concepts.setdefault(heading, steps)
+            return changed
+        except Exception as exception:
+            logger.error(exception)
+            return False
+
+    def expand(self, step: str, _expanding: tuple = ()):
+        """The steps run for a step text: the steps of a concept (and of its nested concepts), the step itself otherwise."""
+        key = normalize_step(step)
+        if key not in self._concepts or key in _expanding:
+            return [step]
+        return [expanded for concept_step in self._concepts[key] for expanded in self.expand(concept_step, (*_expanding, key))]
+
+    def __len__(self):
+        return len(self._concepts)
+
+
+def parse_concepts(file_path):
+    """{normalized heading: [step texts]} of a concept file, a concept is a "# heading" followed by its "* steps"."""
+    concepts = {}
+    steps = None
+    try:
+        with open(file_path, "r", encoding="utf-8") as data:
+            for line in data:
+                line = line.strip()
+                if line.startswith("#") and not line.startswith("##"):
+                    steps = concepts.setdefault(normalize_step(line[1:]), [])
+                elif line.startswith("*") and steps is not None:
+                    steps.append(line[1:].strip())
+    except Exception as exception:
+        logger.error(exception)
+    return concepts
@@ -0,0 +1,193 @@
+import os
+import time
+
+from . import logger
+
+# One round trip which finds an element by xpath or id and returns its state:
+# {"present": bool, "displayed": bool, "attribute": value of arguments[2] or null}
+ELEMENT_STATE_SCRIPT = """
+var by = arguments[0], locator = arguments[1], name = arguments[2], element = null;
+if (by === "xpath") {
+    element = document.evaluate(locator, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+} else {
+    element = document.getElementById(locator);
+}
+if (!element) {
+    return {"present": false, "displayed": false, "attribute": null};
+}
+var displayed = false;
+if (element.isConnected && (element.offsetWidth || element.offsetHeight || element.getClientRects().length)) {
+    var style = window.getComputedStyle(element);
+    displayed = style.visibility !== "hidden" && style.visibility !== "collapse" && style.display !== "none" && style.opacity !== "0";
+}
+var attribute = null;
+if (name) {
+    var property = element[name];
+    attribute = (property !== undefined && property !== null && typeof property !== "object" && typeof property !== "function") ? String(property) : element.getAttribute(name);
+}
+return {"present": true, "displayed": displayed, "attribute": attribute};
+"""
+
+# Async script which counts the DOM mutations of the document with a MutationObserver (installed once per document)
+# and calls back with {"id": document id, "count": mutations} as soon as it differs from arguments[0] or after arguments[1] ms
+DOM_CHANGE_SCRIPT = """
+var baseline = arguments[0], waitMs = arguments[1], done = arguments[arguments.length - 1];
+var state = document.__autocoreDomChange;
+if (!state) {
+    state = document.__autocoreDomChange = {"id": Math.random().toString(36).slice(2), "count": 0, "listeners": []};
+    new MutationObserver(function (mutations) {
+        state.count += mutations.length;
+        var listeners = state.listeners;
+        state.listeners = [];
+        listeners.forEach(function (listener) { listener(); });
+    }).observe(document, {"childList": true, "subtree": true, "attributes": true, "characterData": true});
+}
+function current() { return {"id": state.id, "count": state.count}; }
+if (!baseline || baseline.id !== state.id || baseline.count !== state.count || waitMs <= 0) {
+    done(current());
+    return;
+}
+var timer = setTimeout(function () { done(current()); }, waitMs);
+state.listeners.push(function () { clearTimeout(timer); done(current()); });
+"""
+
+# Async script which calls back with document.readyState as soon as it is one of arguments[0] or after arguments[1] ms
+READY_STATE_SCRIPT = """
+var states = arguments[0], waitMs = arguments[1], done = arguments[arguments.length - 1];
+if (states.indexOf(document.readyState) >= 0 || waitMs <= 0) {
+    done(document.readyState);
+    return;
+}
+function finish() {
+    clearTimeout(timer);
+    document.removeEventListener("readystatechange", check);
+    done(document.readyState);
+}
+function check() {
+    if (states.indexOf(document.readyState) >= 0) {
+        finish();
+    }
+}
+var timer = setTimeout(finish, waitMs);
+document.addEventListener("readystatechange", check);
+"""
+
+READY_STATES = ["loading", "interactive", "complete"]
+
+# Longest wait of one async script, a longer wait is split into several round trips
+ASYNC_WAIT_CHUNK = 10
+
+
+class Poller:
+    """
+    Call a function until its result satisfies a condition or the timeout is over, sleeping between calls.
+    The interval starts at interval seconds and is multiplied by backoff after each call, up to max_interval.
+    Defaults come from the env settings wait_poll_interval, wait_poll_backoff and wait_poll_max_interval.
+    """
+
+    def __init__(self, interval: float = None, backoff: float = None, max_interval: float = None):
+        self.interval = interval if interval is not None else float(os.getenv("wait_poll_interval", "0.1"))
+        self.backoff = backoff if backoff is not None else float(os.getenv("wait_poll_backoff", "1.5"))
+        self.max_interval = max_interval if max_interval is not None else float(os.getenv("wait_poll_max_interval", "1"))
+
+    def until(self, function, timeout_in_seconds: float, condition=bool):
+        """
+        Returns:
+            tuple: (satisfied, last result of function, elapsed seconds)
+        A function raising an exception counts as a result which does not satisfy the condition.
+        """
+        start_time = time.time()
+        deadline = start_time + max(timeout_in_seconds, 0)
+        interval = self.interval
+        result = None
+        last_exception = None
+        while True:
+            try:
+                result = function()
+                last_exception = None
+                if condition(result):
+                    return True, result, time.time() - start_time
+            except Exception as exception:
+                last_exception = exception
+                result = None
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                if last_exception is not None:
+                    logger.debug(f"Polling is over after {time.time() - start_time:.3f} seconds, last error: {last_exception}")
+                return False, result, time.time() - start_time
+            time.sleep(min(interval, remaining))
+            interval = min(interval * self.backoff, self.max_interval)
+
+
+def wait_until(function, timeout_in_seconds: float, condition=bool, interval: float = None, backoff: float = None, max_interval: float = None):
+    """Shortcut of Poller(interval, backoff, max_interval).until(function, timeout_in_seconds, condition)"""
+    return Poller(interval, backoff, max_interval).until(function, timeout_in_seconds, condition)
+
+
+def execute_async_wait(driver, script, *args, timeout_in_seconds: float = ASYNC_WAIT_CHUNK):
+    """Run an async wait script with a script timeout a bit longer than its own wait, then put the script timeout of the driver back"""
+    try:
+        previous_timeout = driver.timeouts.script
+    except Exception:
+        # A null (unlimited) script timeout cannot be read back, it is left to the wait
+        previous_timeout = None
+    driver.set_script_timeout(timeout_in_seconds + 5)
+    try:
+        return driver.execute_async_script(script, *args, int(max(timeout_in_seconds, 0) * 1000))
+    finally:
+        if previous_timeout is not None:
+            driver.set_script_timeout(previous_timeout)
+
+
+def is_driver_failure(exception):
+    return any(message in str(exception) for message in ["not reachable", "no such window", "Connection refused"])
+
+
+def wait_for_dom_change(driver, timeout_in_seconds: float):
+    """
+    Wait for the DOM of the current page to change (or for another document to be loaded), in the page itself.
+    Returns:
+        tuple: (changed, elapsed seconds)
+    """
+    start_time = time.time()
+    baseline = None
+    while True:
+        remaining = timeout_in_seconds - (time.time() - start_time)
+        try:
+            state = execute_async_wait(driver, DOM_CHANGE_SCRIPT, baseline, timeout_in_seconds=min(max(remaining, 0), ASYNC_WAIT_CHUNK) if baseline else 0)
+            if baseline is not None and state != baseline:
+                return True, time.time() - start_time
+            baseline = state
+        except Exception as exception:
+            if is_driver_failure(exception):
+                raise
+            if baseline is not None:
+                # The document has been unloaded while waiting, the page is changing
+                return True, time.time() - start_time
+            time.sleep(0.1)
+        if remaining <= 0:
+            return False, time.time() - start_time
+
+
+def wait_for_ready_state(driver, states: list, timeout_in_seconds: float):
+    """
+    Wait for document.readyState to be one of states with readystatechange events in the page.
+    Returns:
+        str: the last ready state, "driver failed" if the driver is gone, None if it cannot be read
+    """
+    start_time = time.time()
+    state = None
+    while True:
+        remaining = timeout_in_seconds - (time.time() - start_time)
+        try:
+            state = execute_async_wait(driver, READY_STATE_SCRIPT, states, timeout_in_seconds=min(max(remaining, 0), ASYNC_WAIT_CHUNK))
+            if state in states:
+                return state
+        except Exception as exception:
+            if is_driver_failure(exception):
+                return "driver failed"
+            # The document has been unloaded while waiting, wait on the next one
+            state = None
+            time.sleep(0.1)
+        if remaining <= 0:
+            return state
@@ -0,0 +1,29 @@
+import json
+
+from autocore.utils.schema_util import get_errors, load_schemas
+
+
+def write_schema(path, schema):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(schema), encoding="utf-8")
+
+
+def test_sibling_ref_resolves_from_the_file_which_contains_it(tmp_path):
+    address = {"type": "object", "properties": {"zip": {"type": "string"}}, "required": ["zip"]}
+    write_schema(tmp_path / "users" / "addr.json", address)
+    write_schema(tmp_path / "users" / "user.json", {"type": "object", "properties": {"address": {"$ref": "addr.json"}}})
+    write_schema(tmp_path / "orders" / "order.json", {"type": "object", "properties": {"user": {"$ref": "../users/user.json"}}})
+
+    assert sorted(load_schemas(str(tmp_path))) == ["orders/order", "users/addr", "users/user"]
+    assert get_errors({"address": {"zip": "75001"}}, "users/user") == []
+    assert [error["path"] for error in get_errors({"address": {}}, "users/user")] == ["/address"]
+    assert [error["path"] for error in get_errors({"user": {"address": {"zip": 75001}}}, "orders/order")] == ["/user/address/zip"]
+
+
+def test_sibling_ref_of_a_schema_with_an_http_id(tmp_path):
+    write_schema(tmp_path / "api" / "item.json", {"type": "object", "required": ["id"]})
+    write_schema(tmp_path / "api" / "list.json", {"$id": "https://example.com/schemas/list.json", "type": "array", "items": {"$ref": "item.json"}})
+
+    load_schemas(str(tmp_path))
+    assert get_errors([{"id": 1}], "https://example.com/schemas/list.json") == []
+    assert [error["validator"] for error in get_errors([{}], "api/list")] == ["required"]